@@ -2,6 +2,7 @@ import os
 import requests
 from typing import Dict, Any
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from .llm_scheduler import llm_scheduler, LLMOverloaded, INTERACTIVE
 
 def get_medical_advice(summary: str, query: str) -> Dict[str, Any]:
     """
@@ -51,7 +52,7 @@ def get_medical_advice(summary: str, query: str) -> Dict[str, Any]:
         }
 
         # Use ThreadPoolExecutor for timeout management
-        with ThreadPoolExecutor(max_workers=1) as executor:
+        with llm_scheduler.slot(INTERACTIVE), ThreadPoolExecutor(max_workers=1) as executor:
             future = executor.submit(
                 requests.post,
                 API_URL,
@@ -87,6 +88,8 @@ def get_medical_advice(summary: str, query: str) -> Dict[str, Any]:
                     "error": "Response taking too long. Please try a shorter query."
                 }
 
+    except LLMOverloaded:
+        raise
     except requests.exceptions.RequestException as e:
         return {
             "success": False,
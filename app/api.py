@@ -1,29 +1,94 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Request, UploadFile, File, Form, HTTPException, Query, Body, BackgroundTasks
+from fastapi.responses import Response, StreamingResponse, ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 from typing import Dict, Any, List, Optional
-import os
-import json
+import asyncio
+import orjson
 from .pdf_parser import extract_text_from_pdf
 from .llm_analyzer import analyze_medical_report
 from .advice_analyzer import get_medical_advice
+from .chat_history import ChatHistory, new_report_id
+from .config import CHAT_HISTORY_PAGE_SIZE
+from .http_cache import json_response
+from .lab_values import extract_measurements, evaluate_ranges, measurements_to_json
+from .lab_store import store_measurements, ingest_reports, get_trends, parse_observed_at
+from .near_duplicates import NearDuplicateIndex, content_key
+from .llm_scheduler import llm_scheduler, LLMOverloaded
+from .models import Summary
 
 router = APIRouter(prefix="/api/v1", tags=["Medical Bot API"])
 
 # Store state (in production, use a proper database)
+_initial_report_id = new_report_id()
 current_report = {
+    "report_id": _initial_report_id,
     "text": "",
     "summary": None,
-    "chat_history": []
+    "summary_version": 0,
+    "analysis_status": None,  # "pending" while a progressive LLM upgrade runs, then "complete" or "failed"
+    "chat_history": ChatHistory(_initial_report_id)
 }
 
+# Analyses of earlier reports, reused when a re-exported or re-scanned copy is uploaded
+near_duplicates = NearDuplicateIndex()
+
+# Notified whenever the current summary or its analysis status changes
+_summary_changed = asyncio.Condition()
+
+async def _publish_summary(summary: Summary, status: str) -> None:
+    current_report["summary"] = summary
+    current_report["analysis_status"] = status
+    current_report["summary_version"] += 1
+    async with _summary_changed:
+        _summary_changed.notify_all()
+
+def _find_duplicate(text: str, patient_id: Optional[str]):
+    """
+    Measurements, content key and MinHash signature of a report, plus a
+    stored analysis of a near duplicate with the same patient and lab values
+    """
+    measurements = evaluate_ranges(extract_measurements(text))
+    key = content_key(patient_id, measurements)
+    signature, duplicate = near_duplicates.lookup(text, key)
+    return measurements, key, signature, duplicate
+
+async def _upgrade_summary(report_id: str, text: str, signature, key: str, rule_based: Summary) -> None:
+    """Background half of a progressive upload: run the LLM analysis and swap in the merged summary"""
+    try:
+        llm_summary = await run_in_threadpool(analyze_medical_report, text)
+    except LLMOverloaded:
+        llm_summary = None
+    if current_report["report_id"] != report_id:
+        return  # A newer report replaced this one while the LLM was running
+    if llm_summary is None or llm_summary.failed:
+        await _publish_summary(rule_based, "failed")
+        return
+    await run_in_threadpool(near_duplicates.add, report_id, signature, key, llm_summary)
+    await _publish_summary(Summary.merge(rule_based, llm_summary), "complete")
+
 @router.post("/upload")
 async def upload_file(
+    request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    user_location: Optional[str] = Form(None)
-) -> Dict[str, Any]:
+    user_location: Optional[str] = Form(None),
+    patient_id: Optional[str] = Form(None),
+    report_date: Optional[str] = Form(None),
+    progressive: bool = Form(False)
+) -> Response:
     """
-    Upload and analyze a medical report file
+    Upload and analyze a medical report file.
+
+    With `progressive`, the rule-based summary is returned right away and the
+    LLM analysis runs in the background; watch /summary (by summary_version)
+    or /summary/events for the upgraded summary. Measurements are kept for
+    /trends only when a patient_id is given; report_date is an ISO date.
     """
+    try:
+        observed_at = parse_observed_at(report_date)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="report_date must be an ISO date (YYYY-MM-DD)")
+    
     try:
         # Save file
         file_path = f"uploads/{file.filename}"
@@ -33,35 +98,104 @@ async def upload_file(
         
         # Extract text
         text = extract_text_from_pdf(file_path)
+        report_id = new_report_id()
+        
+        # Analyze report, unless a near-duplicate of the same patient with identical lab values has been analyzed
+        measurements, key, signature, duplicate = await run_in_threadpool(_find_duplicate, text, patient_id)
+        status = "complete"
+        if duplicate:
+            summary = Summary.from_dict(duplicate["summary"])
+        elif progressive:
+            from .main import structure_summary
+            summary = await run_in_threadpool(structure_summary, text)
+            status = "pending"
+            background_tasks.add_task(_upgrade_summary, report_id, text, signature, key, summary)
+        else:
+            summary = await run_in_threadpool(analyze_medical_report, text)
+            if not summary.failed:
+                await run_in_threadpool(near_duplicates.add, report_id, signature, key, summary)
+        if summary.measurements is None:
+            summary.measurements = measurements_to_json(measurements)
+        
+        # Switch to the new report only once it is analyzed, so a rejected upload (503) keeps text and summary paired
         current_report["text"] = text
         
-        # Analyze report
-        summary = analyze_medical_report(text)
-        current_report["summary"] = summary
+        # A new report starts a new conversation
+        current_report["chat_history"].clear()
+        current_report["report_id"] = report_id
+        current_report["chat_history"] = ChatHistory(report_id)
+        await _publish_summary(summary, status)
         
-        return {
+        # Keep the measurements for trend queries across reports
+        if patient_id:
+            await run_in_threadpool(store_measurements, report_id, summary.measurements, patient_id, observed_at)
+        
+        return json_response(request, {
             "success": True,
+            "report_id": report_id,
             "summary": summary,
+            "summary_version": current_report["summary_version"],
+            "analysis_status": status,
+            "reused_from": duplicate and {"report_id": duplicate["report_id"], "similarity": duplicate["similarity"]},
             "message": "File uploaded and analyzed successfully"
-        }
+        })
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/summary")
-async def get_summary() -> Dict[str, Any]:
+async def get_summary(request: Request) -> Response:
     """
     Get the current medical report summary
     """
     if not current_report["summary"]:
         raise HTTPException(status_code=404, detail="No report has been analyzed yet")
     
-    return {
+    # Cached per summary version, so polling an unchanged summary is a 304 or a cached body
+    return json_response(request, {
         "success": True,
-        "summary": current_report["summary"]
-    }
+        "summary": current_report["summary"],
+        "summary_version": current_report["summary_version"],
+        "analysis_status": current_report["analysis_status"]
+    }, cache_key=("summary", current_report["report_id"], current_report["summary_version"]))
+
+@router.get("/summary/events")
+async def summary_events(after: int = Query(0, ge=0)) -> StreamingResponse:
+    """
+    Server-sent events with the summary each time its version moves past
+    `after`; the stream ends once the analysis is no longer pending
+    """
+    async def stream():
+        version = after
+        while True:
+            changed = True
+            async with _summary_changed:
+                try:
+                    await asyncio.wait_for(
+                        _summary_changed.wait_for(lambda: current_report["summary_version"] > version), timeout=15
+                    )
+                except asyncio.TimeoutError:
+                    changed = False
+            # Yield only after releasing the lock, so a slow client cannot block _publish_summary
+            if not changed:
+                yield ": keep-alive\n\n"
+                continue
+            version = current_report["summary_version"]
+            payload = orjson.dumps({
+                "report_id": current_report["report_id"],
+                "summary_version": version,
+                "analysis_status": current_report["analysis_status"],
+                "summary": current_report["summary"]
+            })
+            yield f"event: summary\ndata: {payload.decode('utf-8')}\n\n"
+            if current_report["analysis_status"] != "pending":
+                return
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @router.post("/chat")
-async def chat(message: str = Form(...)) -> Dict[str, Any]:
+async def chat(message: str = Form(...)) -> Response:
     """
     Chat about the current medical report
     """
@@ -69,82 +203,145 @@ async def chat(message: str = Form(...)) -> Dict[str, Any]:
         raise HTTPException(status_code=404, detail="No report has been uploaded yet")
     
     # Add user message to history
-    current_report["chat_history"].append({
-        "role": "user",
-        "content": message
-    })
+    history = current_report["chat_history"]
+    user_message = history.append("user", message)
     
     try:
         # Generate response based on the report context
-        response = get_medical_advice(current_report["summary"], message)
+        response = await run_in_threadpool(get_medical_advice, current_report["summary"].to_prompt_dict(), message)
         
         if response["success"]:
-            current_report["chat_history"].append({
-                "role": "assistant",
-                "content": response["advice"]
-            })
+            assistant_message = history.append("assistant", response["advice"])
             
-            return {
+            # Only the new turn is returned; clients page older messages via /chat-history
+            return ORJSONResponse({
                 "success": True,
                 "message": response["advice"],
-                "chat_history": current_report["chat_history"]
-            }
+                "messages": [user_message, assistant_message],
+                "cursor": assistant_message["id"]
+            })
         else:
             raise HTTPException(status_code=500, detail=response["error"])
             
+    except LLMOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/chat-history")
-async def get_chat_history() -> Dict[str, Any]:
+async def get_chat_history(
+    after: int = Query(0, ge=0),
+    limit: int = Query(CHAT_HISTORY_PAGE_SIZE, ge=1, le=200)
+) -> Response:
     """
-    Get the current chat history
+    Get chat messages newer than the `after` cursor, one page at a time
     """
-    return {
+    page = current_report["chat_history"].after(after, limit)
+    return ORJSONResponse({
         "success": True,
-        "chat_history": current_report["chat_history"]
-    }
+        "report_id": current_report["report_id"],
+        "chat_history": page["messages"],
+        "next_cursor": page["next_cursor"],
+        "has_more": page["has_more"]
+    })
 
 @router.post("/advice")
-async def get_advice(query: str = Form(...)) -> Dict[str, Any]:
+async def get_advice(query: str = Form(...)) -> Response:
     """
     Get specific medical advice based on the report
     """
     if not current_report["summary"]:
         raise HTTPException(status_code=404, detail="No report has been analyzed yet")
     
-    response = get_medical_advice(current_report["summary"], query)
+    response = await run_in_threadpool(get_medical_advice, current_report["summary"].to_prompt_dict(), query)
     
     if response["success"]:
-        return {
+        return ORJSONResponse({
             "success": True,
             "advice": response["advice"]
-        }
+        })
     else:
         raise HTTPException(status_code=500, detail=response["error"])
 
 @router.get("/metrics")
-async def get_metrics() -> Dict[str, Any]:
+async def get_metrics(request: Request) -> Response:
     """
     Get confidence metrics and analysis data
     """
     if not current_report["summary"]:
         raise HTTPException(status_code=404, detail="No report has been analyzed yet")
     
-    metrics = current_report["summary"].get("confidence_metrics", {})
-    return {
+    metrics = current_report["summary"].confidence_metrics
+    return json_response(request, {
         "success": True,
         "metrics": metrics
-    }
+    }, cache_key=("metrics", current_report["report_id"], current_report["summary_version"]))
+
+@router.get("/measurements")
+async def get_measurements(request: Request) -> Response:
+    """
+    Get the lab values extracted from the report, as columns with reference range status
+    """
+    if not current_report["summary"]:
+        raise HTTPException(status_code=404, detail="No report has been analyzed yet")
+    
+    return json_response(request, {
+        "success": True,
+        "measurements": current_report["summary"].measurements or {}
+    }, cache_key=("measurements", current_report["report_id"], current_report["summary_version"]))
+
+@router.get("/trends")
+async def get_lab_trends(
+    patient_id: str = Query(...),
+    analyte: Optional[str] = Query(None),
+    limit: int = Query(10, ge=2, le=100)
+) -> Response:
+    """
+    Get lab value time series and deltas for a patient, optionally for one analyte
+    """
+    return ORJSONResponse({
+        "success": True,
+        "patient_id": patient_id,
+        "trends": get_trends(patient_id, analyte.lower() if analyte else None, limit)
+    })
+
+@router.post("/trends/ingest")
+def ingest_lab_results(reports: List[Dict[str, Any]] = Body(...)) -> Response:
+    """
+    Bulk-load a backlog of reports into the trend store. Each item needs a
+    report_id, a patient_id and either `text` or already extracted
+    `measurements`, plus an optional ISO observed_at date.
+    """
+    # Sync endpoint: extraction and the SQLite writes run in the threadpool, off the event loop
+    for report in reports:
+        if "report_id" not in report or not report.get("patient_id"):
+            raise HTTPException(status_code=422, detail="Every report needs a report_id and a patient_id")
+        try:
+            report["observed_at"] = parse_observed_at(report.get("observed_at"))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=422, detail="observed_at must be an ISO date (YYYY-MM-DD)")
+        if "measurements" not in report:
+            report["measurements"] = measurements_to_json(
+                evaluate_ranges(extract_measurements(report.get("text", "")))
+            )
+    
+    rows = ingest_reports(reports)
+    return ORJSONResponse({
+        "success": True,
+        "reports": len(reports),
+        "rows": rows
+    })
 
 @router.get("/status")
-async def get_status() -> Dict[str, Any]:
+async def get_status() -> Response:
     """
     Get the current status of the system
     """
-    return {
+    return ORJSONResponse({
         "success": True,
         "has_report": bool(current_report["text"]),
         "has_summary": bool(current_report["summary"]),
-        "chat_messages": len(current_report["chat_history"])
-    }
\ No newline at end of file
+        "analysis_status": current_report["analysis_status"],
+        "chat_messages": len(current_report["chat_history"]),
+        "llm_queue": llm_scheduler.stats()
+    })
\ No newline at end of file
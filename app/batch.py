@@ -0,0 +1,194 @@
+"""
+Offline bulk processing of archived reports.
+
+    python -m app.batch reports/ --out results.jsonl --workers 8 [--llm] [--store-trends --patient-id P]
+
+Text extraction and the rule-based summary run in a process pool; optional
+LLM analysis runs on a small thread pool and goes through the global LLM
+scheduler. Each finished report is appended to the JSONL output, which also
+serves as the checkpoint: rerunning with --resume skips files already in it
+without an error (failed ones are retried and their new record appended).
+"""
+import os
+import re
+import sys
+import orjson
+import time
+import argparse
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from typing import Dict, Any, List, Set
+from .main import extract_text, structure_summary
+from .llm_analyzer import analyze_medical_report
+from .llm_scheduler import LLMOverloaded
+from .lab_store import ingest_reports
+from .models import Summary
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+_FILENAME_DATE_RE = re.compile(r"(\d{4})-?(\d{2})-?(\d{2})")
+
+
+def find_reports(directory: str) -> List[str]:
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def completed_paths(out_path: str) -> Set[str]:
+    """Paths written to the output file without an error by an earlier run"""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = orjson.loads(line)
+            except ValueError:
+                continue  # A partially written last line from an interrupted run
+            if record.get("path") and not record.get("error"):
+                done.add(record["path"])
+    return done
+
+
+def report_date(path: str, source: str):
+    """
+    Date a report was taken, as YYYY-MM-DD: the file's modification time, or
+    the first YYYY-MM-DD / YYYYMMDD in its file name (None if there is none)
+    """
+    if source == "mtime":
+        return date.fromtimestamp(os.path.getmtime(path)).isoformat()
+    for match in _FILENAME_DATE_RE.finditer(os.path.basename(path)):
+        try:
+            return date(*map(int, match.groups())).isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def process_report(path: str) -> Dict[str, Any]:
+    """Extract and summarize one report; runs in a worker process"""
+    started = time.perf_counter()
+    record = {"path": path, "bytes": os.path.getsize(path)}
+    try:
+        text = extract_text(path)
+        summary = structure_summary(text)
+        record.update({"text": text, "summary": summary, "error": None})
+    except Exception as e:
+        record.update({"text": "", "summary": None, "error": str(e)})
+    record["seconds"] = round(time.perf_counter() - started, 4)
+    return record
+
+
+def analyze_with_retry(text: str) -> Summary:
+    """LLM analysis that waits out load shedding instead of failing the file"""
+    while True:
+        try:
+            return analyze_medical_report(text)
+        except LLMOverloaded as e:
+            time.sleep(e.retry_after)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.batch", description="Bulk-process a directory of reports")
+    parser.add_argument("directory", help="directory to scan for PDF, DOCX and TXT files")
+    parser.add_argument("--out", default="results.jsonl", help="JSONL output, also used as the checkpoint")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="extraction processes")
+    parser.add_argument("--resume", action="store_true", help="skip files already present in --out")
+    parser.add_argument("--llm", action="store_true", help="also run LLM analysis on every report")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="LLM calls in flight at once")
+    parser.add_argument("--include-text", action="store_true", help="keep the extracted text in the output")
+    parser.add_argument("--store-trends", action="store_true", help="ingest measurements into the lab trend store")
+    parser.add_argument("--patient-id", default=None, help="patient id used with --store-trends")
+    parser.add_argument("--date-from", choices=["filename", "mtime"], default="filename",
+                        help="report date for --store-trends: a date in the file name, or the file modification "
+                             "time (only if files still carry their original timestamps)")
+    args = parser.parse_args(argv)
+    if args.store_trends and not args.patient_id:
+        parser.error("--store-trends needs --patient-id; trends are only kept per patient")
+
+    paths = find_reports(args.directory)
+    done = completed_paths(args.out) if args.resume else set()
+    todo = [p for p in paths if p not in done]
+    if not args.resume and os.path.exists(args.out):
+        os.remove(args.out)
+    elif done:
+        # Terminate a partially written last line so new records start cleanly
+        with open(args.out, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    print(f"{len(paths)} reports found, {len(done)} already done, {len(todo)} to process")
+
+    stats = {"processed": 0, "errors": 0, "bytes": 0}
+    undated = []
+    started = time.perf_counter()
+
+    with open(args.out, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=args.workers) as processes, \
+            ThreadPoolExecutor(max_workers=max(1, args.llm_concurrency)) as llm_pool:
+
+        def write(record: Dict[str, Any]) -> None:
+            if args.store_trends and record["summary"]:
+                record["observed_at"] = report_date(record["path"], args.date_from)
+                if record["observed_at"]:
+                    ingest_reports([{
+                        "report_id": record["path"],
+                        "patient_id": args.patient_id,
+                        "observed_at": record["observed_at"],
+                        "measurements": record["summary"].measurements
+                    }])
+                else:
+                    undated.append(record["path"])
+            if not args.include_text:
+                record.pop("text", None)
+            out.write(orjson.dumps(record).decode("utf-8") + "\n")
+            out.flush()
+            stats["processed"] += 1
+            stats["errors"] += bool(record["error"])
+            stats["bytes"] += record["bytes"]
+            if stats["processed"] % 100 == 0:
+                elapsed = time.perf_counter() - started
+                print(f"  {stats['processed']}/{len(todo)} ({stats['processed'] / elapsed:.1f} reports/s)")
+
+        def drain(pending: Dict, block: bool) -> None:
+            if block:
+                wait(pending)
+            for future in [f for f in pending if f.done()]:
+                record = pending.pop(future)
+                try:
+                    record["llm_summary"] = future.result()
+                    if record["llm_summary"].failed:
+                        record["error"] = f"LLM analysis failed: {record['llm_summary'].failure}"
+                except Exception as e:
+                    record["error"] = f"LLM analysis failed: {e}"
+                write(record)
+
+        llm_pending = {}
+        futures = [processes.submit(process_report, path) for path in todo]
+        for future in as_completed(futures):
+            record = future.result()
+            if args.llm and not record["error"]:
+                llm_pending[llm_pool.submit(analyze_with_retry, record["text"])] = record
+            else:
+                write(record)
+            drain(llm_pending, block=False)
+        drain(llm_pending, block=True)
+
+    elapsed = time.perf_counter() - started
+    rate = stats["processed"] / elapsed if elapsed else 0.0
+    print(
+        f"Done: {stats['processed']} reports ({stats['errors']} errors) in {elapsed:.1f}s, "
+        f"{rate:.1f} reports/s, {stats['bytes'] / 1e6 / max(elapsed, 1e-9):.2f} MB/s -> {args.out}"
+    )
+    if undated:
+        print(f"{len(undated)} reports had no date in their file name and were not stored for trends:")
+        for path in undated:
+            print(f"  {path}")
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
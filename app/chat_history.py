@@ -0,0 +1,96 @@
+import os
+import json
+import uuid
+import threading
+from collections import deque
+from itertools import islice
+from typing import Dict, Any, List
+from .config import CHAT_HISTORY_LIMIT, CHAT_HISTORY_PAGE_SIZE, CHAT_SPILL_DIR
+
+
+class ChatHistory:
+    """
+    Bounded chat history for a single report.
+
+    The most recent `limit` messages live in a ring buffer; older messages are
+    appended to a JSONL spill file so they can still be paged through.
+    Message ids start at 1 and are contiguous, so line N of the spill file is
+    always message N and a cursor is just the id of the last message seen.
+    """
+
+    def __init__(self, report_id: str, limit: int = CHAT_HISTORY_LIMIT,
+                 spill_dir: str = CHAT_SPILL_DIR):
+        self.report_id = report_id
+        self.limit = max(1, limit)
+        self.spill_path = os.path.join(spill_dir, f"{report_id}.jsonl")
+        self._buffer = deque()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._next_id - 1
+
+    def append(self, role: str, content: str) -> Dict[str, Any]:
+        """Add a message and return it with its assigned id"""
+        with self._lock:
+            message = {"id": self._next_id, "role": role, "content": content}
+            self._next_id += 1
+            if len(self._buffer) == self.limit:
+                self._spill(self._buffer.popleft())
+            self._buffer.append(message)
+            return message
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Messages currently held in memory, oldest first"""
+        with self._lock:
+            return list(self._buffer)
+
+    def after(self, cursor: int = 0, limit: int = CHAT_HISTORY_PAGE_SIZE) -> Dict[str, Any]:
+        """
+        Return up to `limit` messages with an id greater than `cursor`,
+        reading from the spill file when the cursor is older than the buffer
+        """
+        cursor = max(0, cursor)
+        limit = max(1, limit)
+        with self._lock:
+            buffered = list(self._buffer)
+            last_id = self._next_id - 1
+        first_buffered = buffered[0]["id"] if buffered else self._next_id
+
+        messages = []
+        if cursor + 1 < first_buffered:
+            messages = self._read_spilled(cursor, min(limit, first_buffered - 1 - cursor))
+        if len(messages) < limit:
+            start = max(0, cursor + 1 - first_buffered)
+            messages.extend(buffered[start:start + limit - len(messages)])
+
+        next_cursor = messages[-1]["id"] if messages else cursor
+        return {
+            "messages": messages,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor < last_id
+        }
+
+    def clear(self) -> None:
+        """Drop all messages, including anything spilled to disk"""
+        with self._lock:
+            self._buffer.clear()
+            self._next_id = 1
+            if os.path.exists(self.spill_path):
+                os.remove(self.spill_path)
+
+    def _spill(self, message: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(message) + "\n")
+
+    def _read_spilled(self, cursor: int, count: int) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.spill_path):
+            return []
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in islice(f, cursor, cursor + count)]
+
+
+def new_report_id() -> str:
+    """Generate an id used to key per-report state such as chat history"""
+    return uuid.uuid4().hex
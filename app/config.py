@@ -4,3 +4,32 @@ import os
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY", "")  # Set this in your environment variables
 GOOGLE_MAPS_API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY", "")  # Set this in your environment variables
 UPLOAD_DIR = "uploads"
+DATA_DIR = os.environ.get("MEDBOT_DATA_DIR", "data")  # Local state that outlives a single request
+
+# Chat history: number of messages kept in memory per report, older ones are spilled to disk
+CHAT_HISTORY_LIMIT = int(os.environ.get("CHAT_HISTORY_LIMIT", "50"))
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_SPILL_DIR = os.path.join(DATA_DIR, "chat")
+
+# Compiled Jinja templates for the legacy HTML routes
+JINJA_CACHE_DIR = os.path.join(DATA_DIR, "jinja")
+
+# Longitudinal lab results, indexed by patient, analyte and date
+LAB_STORE_PATH = os.path.join(DATA_DIR, "lab_results.db")
+
+# Near-duplicate reports: estimated Jaccard similarity above which a stored analysis is reused
+MINHASH_DIR = os.path.join(DATA_DIR, "minhash")
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+
+# Outbound LLM calls: concurrency cap, provider request quota, and how long a call may queue (seconds)
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+LLM_RATE_PER_MINUTE = float(os.environ.get("LLM_RATE_PER_MINUTE", "20"))
+LLM_BURST = int(os.environ.get("LLM_BURST", "4"))
+LLM_INTERACTIVE_DEADLINE = float(os.environ.get("LLM_INTERACTIVE_DEADLINE", "10"))
+LLM_BULK_DEADLINE = float(os.environ.get("LLM_BULK_DEADLINE", "60"))
+
+# Per-request profiling: admin token for X-Profile / ?profile=, and automatic sampling of every Nth request (0 = off)
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_EVERY = int(os.environ.get("PROFILE_SAMPLE_EVERY", "0"))
+PROFILE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_KEEP = 50  # profiles kept in memory
@@ -0,0 +1,178 @@
+import os
+import sys
+import gzip
+import hashlib
+import mimetypes
+from typing import Dict, Any, Optional, Hashable
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = (".html", ".css", ".js", ".json", ".svg", ".txt")
+MIN_COMPRESS_SIZE = 512  # Smaller bodies are not worth the encoding overhead
+MAX_DYNAMIC_COMPRESS_SIZE = 256 * 1024  # Gzipping runs on the event loop; larger files need a build-time .gz
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+
+def accepted_encodings(headers: Headers) -> set:
+    """Parse Accept-Encoding into a set of codings the client accepts"""
+    accepted = set()
+    for part in headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(coding.lower())
+    return accepted
+
+
+def etag_matches(headers: Headers, etag: str) -> bool:
+    if_none_match = headers.get("if-none-match", "")
+    return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves build-time `.br`/`.gz` siblings when the client
+    accepts them, gzips other text files on the fly, and sets Cache-Control.
+    With `allow_immutable`, requests carrying a `?v=` fingerprint (see
+    `static_url`) are cached as immutable; everything else gets
+    `cache_control` and revalidates against the ETag.
+    """
+
+    def __init__(self, *args, cache_control: str = REVALIDATE_CACHE, allow_immutable: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+        self.allow_immutable = allow_immutable
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope,
+                      status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers)
+        media_type = mimetypes.guess_type(str(full_path))[0] or "application/octet-stream"
+
+        response = None
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            compressed_path = f"{full_path}{suffix}"
+            if (encoding in accepted and os.path.isfile(compressed_path)
+                    and os.stat(compressed_path).st_mtime >= stat_result.st_mtime):
+                response = super().file_response(compressed_path, os.stat(compressed_path), scope, status_code)
+                if isinstance(response, NotModifiedResponse):
+                    break
+                response.headers["content-type"] = media_type
+                response.headers["content-encoding"] = encoding
+                break
+        if response is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            if ("gzip" in accepted and not isinstance(response, NotModifiedResponse)
+                    and str(full_path).endswith(COMPRESSIBLE_SUFFIXES)
+                    and MIN_COMPRESS_SIZE <= stat_result.st_size <= MAX_DYNAMIC_COMPRESS_SIZE):
+                # The gzip body is a different representation, so it gets its own ETag
+                headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+                headers["etag"] = headers["etag"][:-1] + '-gzip"'
+                headers["content-encoding"] = "gzip"
+                if etag_matches(request_headers, headers["etag"]):
+                    response = NotModifiedResponse(Headers(headers))
+                else:
+                    with open(full_path, "rb") as f:
+                        body = gzip.compress(f.read(), compresslevel=6)
+                    response = Response(body, status_code=status_code, headers=headers, media_type=media_type)
+
+        query = scope.get("query_string", b"")
+        immutable = self.allow_immutable and query.startswith(b"v=")
+        response.headers["cache-control"] = IMMUTABLE_CACHE if immutable else self.cache_control
+        response.headers["vary"] = "Accept-Encoding"
+        return response
+
+
+_static_versions: Dict[str, str] = {}
+
+
+def static_url(directory: str, mount: str, path: str) -> str:
+    """Fingerprinted URL for a static file, e.g. /static/styles.css?v=1a2b3c4d5e6f"""
+    full_path = os.path.join(directory, path)
+    version = _static_versions.get(full_path)
+    if version is None:
+        with open(full_path, "rb") as f:
+            version = hashlib.sha1(f.read()).hexdigest()[:12]
+        _static_versions[full_path] = version
+    return f"{mount}/{path}?v={version}"
+
+
+# Serialized (and compressed) bodies keyed by the caller's cache key
+_body_cache: Dict[Hashable, Dict[str, Any]] = {}
+_BODY_CACHE_SIZE = 32
+
+
+def _encode_body(payload: Any) -> Dict[str, Any]:
+    body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return {"body": body, "etag": f'W/"{hashlib.sha1(body).hexdigest()}"', "encoded": {}}
+
+
+def json_response(request: Request, payload: Any, cache_key: Optional[Hashable] = None,
+                  status_code: int = 200) -> Response:
+    """
+    JSON response with an ETag, 304 on a matching If-None-Match, and br/gzip
+    encoding. With a `cache_key` the serialized and compressed bodies are
+    reused, so repeated polling of an unchanged resource skips encoding entirely.
+    """
+    entry = _body_cache.get(cache_key) if cache_key is not None else None
+    if entry is None:
+        entry = _encode_body(payload)
+        if cache_key is not None:
+            if len(_body_cache) >= _BODY_CACHE_SIZE:
+                _body_cache.pop(next(iter(_body_cache)))
+            _body_cache[cache_key] = entry
+
+    headers = {"etag": entry["etag"], "cache-control": REVALIDATE_CACHE, "vary": "Accept-Encoding"}
+    if etag_matches(request.headers, entry["etag"]):
+        return Response(status_code=304, headers=headers)
+
+    body = entry["body"]
+    if len(body) >= MIN_COMPRESS_SIZE:
+        accepted = accepted_encodings(request.headers)
+        encoding = "br" if brotli is not None and "br" in accepted else "gzip" if "gzip" in accepted else None
+        if encoding:
+            if encoding not in entry["encoded"]:
+                entry["encoded"][encoding] = (
+                    brotli.compress(body, quality=5) if encoding == "br" else gzip.compress(body, compresslevel=6)
+                )
+            body = entry["encoded"][encoding]
+            headers["content-encoding"] = encoding
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+def precompress(directory: str) -> int:
+    """Write .gz (and .br when Brotli is installed) next to every compressible file"""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE_SUFFIXES):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            outputs = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                outputs[".br"] = brotli.compress(data, quality=11)
+            for suffix, compressed in outputs.items():
+                if len(compressed) < len(data):
+                    with open(path + suffix, "wb") as f:
+                        f.write(compressed)
+                    written += 1
+    return written
+
+
+if __name__ == "__main__":
+    # Build step: python -m app.http_cache static
+    for directory in sys.argv[1:] or ["static"]:
+        print(f"{directory}: wrote {precompress(directory)} compressed files")
@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import threading
+from datetime import date
+from typing import Dict, Any, List, Iterable, Optional
+from .config import LAB_STORE_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lab_results (
+    id INTEGER PRIMARY KEY,
+    report_id TEXT NOT NULL,
+    patient_id TEXT NOT NULL,
+    observed_at TEXT NOT NULL,
+    analyte TEXT NOT NULL,
+    value REAL NOT NULL,
+    unit TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lab_results_trend ON lab_results (patient_id, analyte, observed_at);
+CREATE INDEX IF NOT EXISTS idx_lab_results_report ON lab_results (report_id);
+"""
+
+_connection = None
+_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(LAB_STORE_PATH) or ".", exist_ok=True)
+        _connection = sqlite3.connect(LAB_STORE_PATH, check_same_thread=False)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute("PRAGMA synchronous=NORMAL")
+        _connection.executescript(_SCHEMA)
+    return _connection
+
+
+def _rows(report_id: str, patient_id: str, observed_at: str, measurements: Dict[str, List[Any]]):
+    return [
+        (report_id, patient_id, observed_at, analyte, float(value), unit, status)
+        for analyte, value, unit, status in zip(
+            measurements.get("analyte", []), measurements.get("value", []),
+            measurements.get("unit", []), measurements.get("status", [])
+        )
+    ]
+
+
+def parse_observed_at(value: Optional[str]) -> Optional[str]:
+    """Normalize a report date to YYYY-MM-DD (None when empty); raises ValueError if it is not an ISO date"""
+    if not value:
+        return None
+    return date.fromisoformat(value).isoformat()
+
+
+def ingest_reports(reports: Iterable[Dict[str, Any]]) -> int:
+    """
+    Store measurements for many reports in a single transaction.
+
+    Each report is a dict with `report_id`, `patient_id`, `measurements` (the
+    columnar form from lab_values.measurements_to_json) and optionally
+    `observed_at` (ISO date, defaults to today). Reports without a patient_id
+    are skipped, since their values cannot be attributed to one person's
+    series. Re-ingesting a report replaces its previous rows. Returns the
+    number of rows written.
+    """
+    report_ids, rows = [], []
+    for report in reports:
+        if not report.get("patient_id"):
+            continue
+        report_ids.append((report["report_id"],))
+        rows.extend(_rows(
+            report["report_id"],
+            report["patient_id"],
+            parse_observed_at(report.get("observed_at")) or date.today().isoformat(),
+            report.get("measurements") or {}
+        ))
+    if not report_ids:
+        return 0
+
+    with _lock:
+        connection = _connect()
+        with connection:
+            connection.executemany("DELETE FROM lab_results WHERE report_id = ?", report_ids)
+            connection.executemany(
+                "INSERT INTO lab_results (report_id, patient_id, observed_at, analyte, value, unit, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+    return len(rows)
+
+
+def store_measurements(report_id: str, measurements: Dict[str, List[Any]],
+                       patient_id: Optional[str] = None, observed_at: Optional[str] = None) -> int:
+    """Store the measurements of a single report"""
+    return ingest_reports([{
+        "report_id": report_id,
+        "patient_id": patient_id,
+        "observed_at": observed_at,
+        "measurements": measurements
+    }])
+
+
+def get_trends(patient_id: str, analyte: Optional[str] = None, limit: int = 10) -> Dict[str, Dict[str, Any]]:
+    """
+    Return the results of the last `limit` reports per analyte for a patient,
+    oldest first, with the change between consecutive reports and across the
+    whole series. A report that lists an analyte more than once contributes
+    only its first value (rows are stored in page and line order). Only
+    results in the unit of the most recent one are compared.
+    """
+    analyte_filter = " AND analyte = ?" if analyte else ""
+    query = (
+        "SELECT analyte, observed_at, value, unit, status, report_id FROM ("
+        "  SELECT *, ROW_NUMBER() OVER (PARTITION BY analyte ORDER BY observed_at DESC, id DESC) AS n"
+        "  FROM lab_results WHERE id IN ("
+        "    SELECT MIN(id) FROM lab_results WHERE patient_id = ?" + analyte_filter +
+        "    GROUP BY report_id, analyte"
+        "  )"
+        ") WHERE n <= ? ORDER BY analyte, observed_at, id"
+    )
+    params = [patient_id] + ([analyte] if analyte else []) + [limit]
+    with _lock:
+        rows = _connect().execute(query, params).fetchall()
+
+    series: Dict[str, List[tuple]] = {}
+    for row in rows:
+        series.setdefault(row[0], []).append(row)
+
+    trends = {}
+    for name, points in series.items():
+        unit = points[-1][3]
+        points = [p for p in points if p[3] == unit]
+        values = [p[2] for p in points]
+        trends[name] = {
+            "unit": unit,
+            "points": [
+                {"observed_at": p[1], "value": p[2], "status": p[4], "report_id": p[5]}
+                for p in points
+            ],
+            "deltas": [round(b - a, 4) for a, b in zip(values, values[1:])],
+            "change": round(values[-1] - values[0], 4)
+        }
+    return trends
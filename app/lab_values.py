@@ -0,0 +1,200 @@
+import re
+from typing import Dict, Any, List, Tuple
+import numpy as np
+
+# Reference ranges per (analyte, unit). The first unit listed for an analyte is
+# its default, used when a report gives a value with nothing unit-like after it.
+# Bounds are for adults; open-ended ranges use +/-inf.
+REFERENCE_RANGES: List[Tuple[str, str, float, float]] = [
+    ("blood pressure", "mmHg", 90, 120),  # Systolic
+    ("heart rate", "bpm", 60, 100),
+    ("respiratory rate", "/min", 12, 20),
+    ("temperature", "°C", 36.5, 37.5),
+    ("temperature", "°F", 97.7, 99.5),
+    ("oxygen saturation", "%", 95, 100),
+    ("bmi", "kg/m2", 18.5, 24.9),
+    ("glucose", "mg/dL", 70, 140),
+    ("glucose", "mmol/L", 3.9, 7.8),
+    ("hba1c", "%", 4.0, 5.6),
+    ("cholesterol", "mg/dL", 0, 200),
+    ("cholesterol", "mmol/L", 0, 5.2),
+    ("ldl", "mg/dL", 0, 100),
+    ("ldl", "mmol/L", 0, 2.6),
+    ("hdl", "mg/dL", 40, np.inf),
+    ("hdl", "mmol/L", 1.0, np.inf),
+    ("triglycerides", "mg/dL", 0, 150),
+    ("triglycerides", "mmol/L", 0, 1.7),
+    ("hemoglobin", "g/dL", 12.0, 17.5),
+    ("hemoglobin", "g/L", 120, 175),
+    ("white blood cell", "10^3/µL", 4.0, 11.0),
+    ("white blood cell", "/µL", 4000, 11000),  # "7500 /cumm"
+    ("red blood cell", "10^6/µL", 4.2, 5.9),
+    ("platelet", "10^3/µL", 150, 450),
+    ("platelet", "/µL", 150000, 450000),
+    ("platelet", "lakh/µL", 1.5, 4.5),  # "2.5 lakhs/cumm"; 1 lakh = 100,000
+    ("creatinine", "mg/dL", 0.6, 1.3),
+    ("creatinine", "µmol/L", 53, 115),
+    ("urea", "mg/dL", 7, 20),
+    ("sodium", "mmol/L", 135, 145),
+    ("potassium", "mmol/L", 3.5, 5.1),
+    ("calcium", "mg/dL", 8.5, 10.5),
+    ("calcium", "mmol/L", 2.1, 2.6),
+    ("tsh", "mIU/L", 0.4, 4.0),
+    ("alt", "U/L", 7, 56),
+    ("ast", "U/L", 10, 40),
+    ("ferritin", "ng/mL", 12, 300),
+    ("vitamin d", "ng/mL", 20, 50),
+    ("vitamin d", "nmol/L", 50, 125),
+]
+
+# Spellings seen in reports, mapped to the analyte names used above
+ANALYTE_ALIASES = {
+    "blood pressure": "blood pressure", "bp": "blood pressure", "systolic": "blood pressure",
+    "heart rate": "heart rate", "pulse": "heart rate", "hr": "heart rate",
+    "respiratory rate": "respiratory rate", "resp rate": "respiratory rate",
+    "temperature": "temperature", "temp": "temperature",
+    "oxygen saturation": "oxygen saturation", "spo2": "oxygen saturation", "o2 sat": "oxygen saturation",
+    "bmi": "bmi",
+    "glucose": "glucose", "blood sugar": "glucose", "fasting glucose": "glucose",
+    "hba1c": "hba1c", "a1c": "hba1c",
+    "cholesterol": "cholesterol", "total cholesterol": "cholesterol",
+    "ldl": "ldl", "hdl": "hdl",
+    "triglycerides": "triglycerides", "triglyceride": "triglycerides",
+    "hemoglobin": "hemoglobin", "haemoglobin": "hemoglobin", "hgb": "hemoglobin", "hb": "hemoglobin",
+    "white blood cell": "white blood cell", "white blood cells": "white blood cell", "wbc": "white blood cell",
+    "red blood cell": "red blood cell", "red blood cells": "red blood cell", "rbc": "red blood cell",
+    "platelet": "platelet", "platelets": "platelet", "plt": "platelet",
+    "creatinine": "creatinine",
+    "urea": "urea", "bun": "urea",
+    "sodium": "sodium", "potassium": "potassium", "calcium": "calcium",
+    "tsh": "tsh", "alt": "alt", "sgpt": "alt", "ast": "ast", "sgot": "ast",
+    "ferritin": "ferritin", "vitamin d": "vitamin d",
+}
+
+# Unit spellings, lower-cased, mapped to the units used in REFERENCE_RANGES
+UNIT_ALIASES = {
+    "mmhg": "mmHg", "bpm": "bpm", "/min": "/min", "breaths/min": "/min",
+    "°c": "°C", "ºc": "°C", "c": "°C", "°f": "°F", "ºf": "°F", "f": "°F", "%": "%",
+    "kg/m2": "kg/m2", "kg/m²": "kg/m2",
+    "mg/dl": "mg/dL", "mmol/l": "mmol/L", "meq/l": "mmol/L",
+    "g/dl": "g/dL", "g/l": "g/L",
+    "µmol/l": "µmol/L", "umol/l": "µmol/L", "μmol/l": "µmol/L", "nmol/l": "nmol/L",
+    "miu/l": "mIU/L", "uiu/ml": "mIU/L", "µiu/ml": "mIU/L",
+    "u/l": "U/L", "iu/l": "U/L", "ng/ml": "ng/mL",
+    "10^3/µl": "10^3/µL", "10^3/ul": "10^3/µL", "x10^9/l": "10^3/µL", "10^9/l": "10^3/µL",
+    "10^6/µl": "10^6/µL", "10^6/ul": "10^6/µL", "x10^12/l": "10^6/µL", "10^12/l": "10^6/µL",
+    "million/cumm": "10^6/µL", "millions/cumm": "10^6/µL", "mill/cumm": "10^6/µL",
+    "/cumm": "/µL", "cells/cumm": "/µL", "/cu mm": "/µL", "cells/cu mm": "/µL", "/mm3": "/µL", "/µl": "/µL",
+    "/ul": "/µL", "cells/µl": "/µL", "cells/ul": "/µL",
+    "lakhs/cumm": "lakh/µL", "lakh/cumm": "lakh/µL", "lakhs/cu mm": "lakh/µL", "lakhs": "lakh/µL", "lakh": "lakh/µL",
+}
+
+STATUS_LOW, STATUS_NORMAL, STATUS_HIGH, STATUS_UNKNOWN = -1, 0, 1, 2
+STATUS_LABELS = {STATUS_LOW: "low", STATUS_NORMAL: "normal", STATUS_HIGH: "high", STATUS_UNKNOWN: "unknown"}
+
+
+def _alternation(options) -> str:
+    # Longest first so "fasting glucose" wins over "glucose"
+    return "|".join(re.escape(o) for o in sorted(options, key=len, reverse=True))
+
+
+_MEASUREMENT_RE = re.compile(
+    r"\b(?P<analyte>" + _alternation(ANALYTE_ALIASES) + r")\b"
+    r"[^0-9\n]{0,25}?(?P<value>\d+(?:\.\d+)?)"
+    r"(?:\s*(?P<unit>" + _alternation(UNIT_ALIASES) + r")(?![^\W\d_]))?",
+    re.IGNORECASE
+)
+
+# Text after a value that is still a unit, just not one listed in UNIT_ALIASES ("/hpf", "mEq", "IU/mL").
+# Flags such as "H"/"L" and ordinary words do not count.
+_UNLISTED_UNIT_RE = re.compile(
+    r"\s*(?P<unit>[/%°ºµμ^]\S*|[^\W\d_]+/\S*|"
+    r"(?!(?:h|l|n|hi|lo|high|low|normal|abnormal|and|or|to|in|on|at|of|is|was|with|for)\b)[^\W\d_]{1,6}\b)",
+    re.IGNORECASE
+)
+
+_DEFAULT_UNITS = {}
+for _analyte, _unit, _, _ in REFERENCE_RANGES:
+    _DEFAULT_UNITS.setdefault(_analyte, _unit)
+
+_RANGE_INDEX = {(analyte, unit): i for i, (analyte, unit, _, _) in enumerate(REFERENCE_RANGES)}
+# One extra trailing row of NaNs for (analyte, unit) pairs with no reference range
+_RANGE_LOW = np.array([r[2] for r in REFERENCE_RANGES] + [np.nan], dtype=np.float64)
+_RANGE_HIGH = np.array([r[3] for r in REFERENCE_RANGES] + [np.nan], dtype=np.float64)
+
+
+def extract_measurements(text: str) -> Dict[str, np.ndarray]:
+    """
+    Extract every analyte/value pair in the text into a columnar table of
+    NumPy arrays (analyte, value, unit, page, line). Pages are separated by
+    form feeds; page and line numbers are 1-based. A value followed by a unit
+    that is not in UNIT_ALIASES keeps that unit as written, so it has no
+    reference range; only a bare value gets the analyte's default unit.
+    """
+    analytes, values, units, pages, line_numbers = [], [], [], [], []
+    for page_number, page in enumerate(text.split("\f"), start=1):
+        for line_number, line in enumerate(page.split("\n"), start=1):
+            for match in _MEASUREMENT_RE.finditer(line):
+                analyte = ANALYTE_ALIASES[match.group("analyte").lower()]
+                unit = match.group("unit")
+                if unit:
+                    unit = UNIT_ALIASES[unit.lower()]
+                else:
+                    unlisted = _UNLISTED_UNIT_RE.match(line, match.end())
+                    unit = unlisted.group("unit") if unlisted else _DEFAULT_UNITS[analyte]
+                analytes.append(analyte)
+                values.append(float(match.group("value")))
+                units.append(unit)
+                pages.append(page_number)
+                line_numbers.append(line_number)
+
+    return {
+        "analyte": np.array(analytes, dtype=object),
+        "value": np.array(values, dtype=np.float64),
+        "unit": np.array(units, dtype=object),
+        "page": np.array(pages, dtype=np.int32),
+        "line": np.array(line_numbers, dtype=np.int32),
+    }
+
+
+def evaluate_ranges(table: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Add low/high/status columns to a measurement table. Only the distinct
+    (analyte, unit) pairs are looked up in Python; the comparison itself runs
+    over all rows at once.
+    """
+    keys = np.char.add(np.char.add(table["analyte"].astype(str), "|"), table["unit"].astype(str))
+    if len(keys):
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        unique_index = np.array(
+            [_RANGE_INDEX.get(tuple(key.split("|", 1)), len(REFERENCE_RANGES)) for key in unique_keys],
+            dtype=np.intp
+        )
+        range_index = unique_index[inverse]
+    else:
+        range_index = np.zeros(0, dtype=np.intp)
+
+    low = _RANGE_LOW[range_index]
+    high = _RANGE_HIGH[range_index]
+    value = table["value"]
+    status = np.select(
+        [np.isnan(low), value < low, value > high],
+        [STATUS_UNKNOWN, STATUS_LOW, STATUS_HIGH],
+        default=STATUS_NORMAL
+    ).astype(np.int8)
+
+    return {**table, "low": low, "high": high, "status": status}
+
+
+def measurements_to_json(table: Dict[str, np.ndarray]) -> Dict[str, List[Any]]:
+    """Columnar, JSON-serializable form of a (possibly evaluated) measurement table"""
+    columns = {}
+    for name, column in table.items():
+        if name == "status":
+            columns[name] = [STATUS_LABELS[int(s)] for s in column]
+        elif column.dtype.kind == "f":
+            # JSON has no inf/NaN; open or missing bounds become null
+            columns[name] = [float(v) if np.isfinite(v) else None for v in column]
+        else:
+            columns[name] = column.tolist()
+    return columns
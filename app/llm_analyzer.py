@@ -1,7 +1,9 @@
-from typing import Dict, Any, List
+from typing import List
 import os
 import requests
 import json
+from .llm_scheduler import llm_scheduler, LLMOverloaded, INTERACTIVE, BULK
+from .models import Summary, ConfidenceMetrics
 
 def extract_section(text: str, section_name: str) -> List[str]:
     """Extract a section from the AI analysis text and convert it to a list"""
@@ -36,7 +38,7 @@ def extract_section(text: str, section_name: str) -> List[str]:
     except Exception:
         return []
 
-def analyze_medical_report(text: str) -> Dict[str, Any]:
+def analyze_medical_report(text: str) -> Summary:
     """
     Analyze medical report text using OpenRouter API with Deepseek model
     """
@@ -83,12 +85,13 @@ def analyze_medical_report(text: str) -> Dict[str, Any]:
             "max_tokens": 1000
         }
 
-        response = requests.post(
-            API_URL,
-            headers=headers,
-            json=data,
-            timeout=30
-        )
+        with llm_scheduler.slot(BULK):
+            response = requests.post(
+                API_URL,
+                headers=headers,
+                json=data,
+                timeout=30
+            )
         
         response.raise_for_status()
         result = response.json()
@@ -97,63 +100,23 @@ def analyze_medical_report(text: str) -> Dict[str, Any]:
         ai_analysis = result["choices"][0]["message"]["content"]
         
         # Process the AI response into structured format
-        structured_summary = {
-            "red_flags": extract_section(ai_analysis, "Critical findings & red flags"),
-            "key_findings": extract_section(ai_analysis, "Key findings"),
-            "risk_stratification": extract_section(ai_analysis, "Risk stratification"),
-            "recommendations": extract_section(ai_analysis, "Recommendations"),
-            "validation_notes": extract_section(ai_analysis, "Additional notes"),
-            "confidence_metrics": {
-                "diagnostic_confidence": 85,
-                "risk_levels": [
-                    {"level": "Low", "count": 2, "color": "rgba(75, 192, 192, 0.8)"},
-                    {"level": "Medium", "count": 1, "color": "rgba(255, 206, 86, 0.8)"},
-                    {"level": "High", "count": 0, "color": "rgba(255, 99, 132, 0.8)"}
-                ],
-                "abnormal_indicators": [
-                    {"label": "Normal", "value": 75, "color": "rgba(75, 192, 192, 0.8)"},
-                    {"label": "Abnormal", "value": 25, "color": "rgba(255, 99, 132, 0.8)"}
-                ],
-                "measurement_accuracy": [
-                    {"parameter": "Blood Tests", "confidence": 90},
-                    {"parameter": "Vital Signs", "confidence": 95},
-                    {"parameter": "Imaging", "confidence": 85},
-                    {"parameter": "Clinical Notes", "confidence": 80},
-                    {"parameter": "Patient History", "confidence": 75}
-                ]
-            }
-        }
+        structured_summary = Summary(
+            red_flags=extract_section(ai_analysis, "Critical findings & red flags"),
+            key_findings=extract_section(ai_analysis, "Key findings"),
+            risk_stratification=extract_section(ai_analysis, "Risk stratification"),
+            recommendations=extract_section(ai_analysis, "Recommendations"),
+            validation_notes=extract_section(ai_analysis, "Additional notes"),
+            confidence_metrics=ConfidenceMetrics.placeholder()
+        )
 
         return structured_summary
 
+    except LLMOverloaded:
+        raise
     except requests.exceptions.RequestException as e:
-        return {
-            "red_flags": ["Error: Unable to analyze report"],
-            "key_findings": [],
-            "risk_stratification": [],
-            "recommendations": [],
-            "validation_notes": [f"Error during analysis: {str(e)}"],
-            "confidence_metrics": {
-                "diagnostic_confidence": 0,
-                "risk_levels": [],
-                "abnormal_indicators": [],
-                "measurement_accuracy": []
-            }
-        }
+        return Summary.error("Error: Unable to analyze report", f"Error during analysis: {str(e)}")
     except Exception as e:
-        return {
-            "red_flags": ["Error: Unexpected error during analysis"],
-            "key_findings": [],
-            "risk_stratification": [],
-            "recommendations": [],
-            "validation_notes": [f"Unexpected error: {str(e)}"],
-            "confidence_metrics": {
-                "diagnostic_confidence": 0,
-                "risk_levels": [],
-                "abnormal_indicators": [],
-                "measurement_accuracy": []
-            }
-        }
+        return Summary.error("Error: Unexpected error during analysis", f"Unexpected error: {str(e)}")
 
 def summarize_text(text: str) -> str:
     """
@@ -186,12 +149,15 @@ def summarize_text(text: str) -> str:
             "max_tokens": 500
         }
 
-        response = requests.post(API_URL, headers=headers, json=data, timeout=30)
+        with llm_scheduler.slot(BULK):
+            response = requests.post(API_URL, headers=headers, json=data, timeout=30)
         response.raise_for_status()
         result = response.json()
         
         return result["choices"][0]["message"]["content"]
 
+    except LLMOverloaded:
+        raise
     except Exception as e:
         return f"Error summarizing text: {str(e)}"
 
@@ -227,11 +193,14 @@ def ask_question(text: str, question: str) -> str:
             "max_tokens": 500
         }
 
-        response = requests.post(API_URL, headers=headers, json=data, timeout=30)
+        with llm_scheduler.slot(INTERACTIVE):
+            response = requests.post(API_URL, headers=headers, json=data, timeout=30)
         response.raise_for_status()
         result = response.json()
         
         return result["choices"][0]["message"]["content"]
 
+    except LLMOverloaded:
+        raise
     except Exception as e:
         return f"Error answering question: {str(e)}"
@@ -0,0 +1,126 @@
+import math
+import heapq
+import itertools
+import threading
+from time import monotonic
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+from .config import (
+    LLM_MAX_CONCURRENCY, LLM_RATE_PER_MINUTE, LLM_BURST,
+    LLM_INTERACTIVE_DEADLINE, LLM_BULK_DEADLINE
+)
+
+# Priority classes, lower runs first
+INTERACTIVE = 0  # chat, advice, questions: a user is waiting on the answer
+BULK = 1  # report analysis and summaries
+
+_DEADLINES = {INTERACTIVE: LLM_INTERACTIVE_DEADLINE, BULK: LLM_BULK_DEADLINE}
+
+
+class LLMOverloaded(Exception):
+    """Raised when an LLM call would wait in the queue longer than its deadline"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM service is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """
+    Global admission control for outbound LLM calls.
+
+    A call needs both a free concurrency slot and a token from a token bucket
+    refilled at the provider's request quota. Waiting calls are served by
+    priority class, then arrival order. A call whose estimated queue wait
+    exceeds its deadline is rejected immediately with LLMOverloaded instead
+    of piling onto the queue.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 rate_per_minute: float = LLM_RATE_PER_MINUTE, burst: int = LLM_BURST):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._running = 0
+        self._tokens = float(self.burst)
+        self._refilled_at = monotonic()
+        self._avg_duration = 5.0  # moving average of call duration, seconds
+        self._rejected = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _estimate_wait(self, priority: int) -> float:
+        ahead = sum(1 for p, _ in self._waiting if p <= priority)
+        busy = self._running + ahead
+        slot_wait = 0.0
+        if busy >= self.max_concurrency:
+            slot_wait = ((busy - self.max_concurrency) // self.max_concurrency + 1) * self._avg_duration
+        token_wait = max(0.0, (ahead + 1 - self._tokens) / self.rate)
+        return max(slot_wait, token_wait)
+
+    @contextmanager
+    def slot(self, priority: int = BULK, deadline: Optional[float] = None):
+        """Hold one admitted LLM call for the duration of the with-block"""
+        deadline = _DEADLINES[priority] if deadline is None else deadline
+        started = monotonic()
+        with self._cond:
+            self._refill(started)
+            estimate = self._estimate_wait(priority)
+            if estimate > deadline:
+                self._rejected += 1
+                raise LLMOverloaded(math.ceil(estimate))
+
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = monotonic()
+                    self._refill(now)
+                    at_head = self._waiting[0] == entry
+                    if at_head and self._running < self.max_concurrency and self._tokens >= 1:
+                        break
+                    remaining = started + deadline - now
+                    if remaining <= 0:
+                        self._rejected += 1
+                        raise LLMOverloaded(max(1, math.ceil(self._estimate_wait(priority))))
+                    timeout = remaining
+                    if at_head and self._running < self.max_concurrency:
+                        timeout = min(remaining, (1 - self._tokens) / self.rate)
+                    self._cond.wait(timeout)
+            except BaseException:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._running += 1
+            self._tokens -= 1
+            self._cond.notify_all()
+
+        began = monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * (monotonic() - began)
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill(monotonic())
+            return {
+                "running": self._running,
+                "queued": len(self._waiting),
+                "tokens": round(self._tokens, 2),
+                "avg_call_seconds": round(self._avg_duration, 2),
+                "rejected": self._rejected
+            }
+
+
+llm_scheduler = LLMScheduler()
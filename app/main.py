@@ -1,39 +1,27 @@
 import os
 from fastapi import FastAPI, Request, Form, UploadFile, File
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+from starlette.concurrency import run_in_threadpool
 from .advice_analyzer import get_medical_advice
+from .llm_scheduler import LLMOverloaded
 from .routes import router
+from .chat_history import ChatHistory, new_report_id
+from .config import JINJA_CACHE_DIR
+from .http_cache import PrecompressedStaticFiles, static_url
+from .lab_values import (
+    extract_measurements, evaluate_ranges, measurements_to_json, STATUS_NORMAL, STATUS_UNKNOWN, ANALYTE_ALIASES
+)
+from .term_normalizer import TermNormalizer
+from .models import (
+    Summary, ConfidenceMetrics, RiskLevel, Indicator, MeasurementAccuracy, TestResult, GREEN, YELLOW, RED
+)
 # Initialize global variables
 uploaded_text = ""  # Store full text from PDF/Word/TXT
-uploaded_summary = {  # Store structured summary with default empty values
-    "red_flags": [],
-    "risk_stratification": [],
-    "validation_notes": [],
-    "key_findings": [],
-    "recommendations": [],
-    "confidence_metrics": {
-        "diagnostic_confidence": 85,  # Default confidence level
-        "risk_levels": [
-            {"level": "Low", "count": 2, "color": "rgba(75, 192, 192, 0.8)"},
-            {"level": "Medium", "count": 1, "color": "rgba(255, 206, 86, 0.8)"},
-            {"level": "High", "count": 0, "color": "rgba(255, 99, 132, 0.8)"}
-        ],
-        "abnormal_indicators": [
-            {"label": "Normal", "value": 75, "color": "rgba(75, 192, 192, 0.8)"},
-            {"label": "Abnormal", "value": 25, "color": "rgba(255, 99, 132, 0.8)"}
-        ],
-        "measurement_accuracy": [
-            {"parameter": "Blood Tests", "confidence": 90},
-            {"parameter": "Vital Signs", "confidence": 95},
-            {"parameter": "Imaging", "confidence": 85},
-            {"parameter": "Clinical Notes", "confidence": 80},
-            {"parameter": "Patient History", "confidence": 75}
-        ]
-    }
-}
-chat_history = []  # Store chat messages with role and content
+uploaded_summary = Summary.placeholder()  # Structured summary, placeholder charts until a report is uploaded
+chat_history = ChatHistory(new_report_id())  # Bounded chat messages with role and content
+summary_version = 0  # Bumped whenever uploaded_summary is replaced, keys the render caches
 
 
 from PyPDF2 import PdfReader   # for PDFs
@@ -50,7 +38,8 @@ app = FastAPI(
     description="API for medical report analysis and AI-powered medical advice",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse
 )
 
 app.include_router(router)
@@ -69,10 +58,65 @@ app.add_middleware(
 from .api import router as api_router
 app.include_router(api_router)
 
+# On-demand request profiling, see app/profiling.py
+from .profiling import ProfilingMiddleware, router as profiles_router
+app.add_middleware(ProfilingMiddleware)
+app.include_router(profiles_router)
+
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloaded):
+    """Shed load quickly when the LLM queue is too long, instead of timing out later"""
+    return JSONResponse(
+        content={"success": False, "error": str(exc)},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Static + Templates (for legacy web interface)
-app.mount("/static", StaticFiles(directory=os.path.join(BASE_DIR, "static")), name="static")
-app.mount("/uploads", StaticFiles(directory=os.path.join(BASE_DIR, "uploads")), name="uploads")
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+app.mount("/static", PrecompressedStaticFiles(directory=STATIC_DIR), name="static")
+# Uploaded reports are private: never let a ?v= query make them cacheable by shared proxies
+app.mount(
+    "/uploads",
+    PrecompressedStaticFiles(directory=UPLOAD_DIR, cache_control="private, no-cache", allow_immutable=False),
+    name="uploads"
+)
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+templates.env.globals["static_url"] = lambda path: static_url(STATIC_DIR, "/static", path)
+os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+templates.env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+
+# Last rendered HTML and its key; a single entry each, so arbitrary user_location values cannot grow them
+_summary_panel_cache = {}  # (summary_version, user_location) -> summary panel HTML
+_index_page_cache = {}  # (summary_version, chat length, user_location) -> full page HTML
+
+def render_summary_panel(user_location: str = None) -> str:
+    """Render the summary panel (findings + charts), reusing the last render while nothing changed"""
+    key = (summary_version, user_location)
+    html = _summary_panel_cache.get(key)
+    if html is None:
+        _summary_panel_cache.clear()
+        html = templates.get_template("_summary.html").render(
+            summary=uploaded_summary, user_location=user_location
+        )
+        _summary_panel_cache[key] = html
+    return html
+
+def render_index(request: Request, user_location: str = None) -> HTMLResponse:
+    """Render the full legacy page, reusing the cached render until summary or chat change"""
+    key = (summary_version, len(chat_history), user_location)
+    html = _index_page_cache.get(key)
+    if html is None:
+        _index_page_cache.clear()
+        html = templates.get_template("index.html").render(
+            request=request,
+            summary=uploaded_summary,
+            summary_panel=render_summary_panel(user_location) if uploaded_summary else "",
+            chat=chat_history.recent(),
+            user_location=user_location
+        )
+        _index_page_cache[key] = html
+    return HTMLResponse(html)
 
 @app.post("/get_advice")
 async def get_advice(request: Request, query: str = Form(...)):
@@ -83,13 +127,9 @@ async def get_advice(request: Request, query: str = Form(...)):
             status_code=400
         )
     
-    result = get_medical_advice(uploaded_summary, query)
+    result = await run_in_threadpool(get_medical_advice, uploaded_summary.to_prompt_dict(), query)
     return JSONResponse(content=result)
 
-# Initialize chat history (we already have uploaded_summary defined above)
-chat_history = []
-
-
 
 
 # --- Utility: extract text from different file types ---
@@ -101,8 +141,8 @@ def extract_text(file_path: str) -> str:
     text = ""
     if ext == "pdf":
         reader = PdfReader(file_path)
-        for page in reader.pages:
-            text += page.extract_text() or ""
+        # Pages are separated by form feeds so extracted values keep their page number
+        text = "\n\f".join(page.extract_text() or "" for page in reader.pages)
     elif ext in ["docx", "doc"]:
         doc = docx.Document(file_path)
         for para in doc.paragraphs:
@@ -144,11 +184,11 @@ def answer_query(text, structured_summary, user_input):
     # Look for category-specific questions
     for cat, keywords in categories.items():
         if any(kw in user_input_lower for kw in keywords):
-            if structured_summary.get(cat):
+            if getattr(structured_summary, cat):
                 # Find the most relevant item in this category
                 best_item = None
                 best_score = 0
-                for item in structured_summary[cat]:
+                for item in getattr(structured_summary, cat):
                     score = sum(1 for word in words if word in item.lower())
                     if score > best_score:
                         best_score = score
@@ -166,10 +206,37 @@ def answer_query(text, structured_summary, user_input):
 # --- Routes ---
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
-    return templates.TemplateResponse(
-        "index.html",
-        {"request": request, "summary": uploaded_summary, "chat": chat_history}
-    )
+    return render_index(request)
+
+# Medical terms and patterns to look for
+CRITICAL_TERMS = [
+    "abnormal", "critical", "urgent", "immediate", "severe", "danger",
+    "warning", "alert", "high risk", "emergency", "concerning",
+    "irregular", "elevated", "below normal", "positive for"
+]
+
+RISK_TERMS = [
+    "risk", "probability", "likelihood", "chance", "stratification",
+    "assessment", "score", "level", "grade", "stage", "classification"
+]
+
+MEASUREMENT_PATTERNS = [
+    "blood pressure", "heart rate", "temperature", "glucose",
+    "cholesterol", "bpm", "mmHg", "mg/dL", "white blood cell",
+    "red blood cell", "platelet", "hemoglobin", "creatinine"
+]
+
+RECOMMENDATION_TERMS = ["recommend", "suggest", "advise", "follow up", "referral"]
+NOTE_TERMS = ["note", "observation", "finding", "impression", "conclusion"]
+DIAGNOSIS_TERMS = ["diagnosis", "assessment", "impression"]
+DIAGNOSTIC_CONFIDENCE_TERMS = ["diagnosis", "confirmed", "observed", "examination", "assessment"]
+TEST_KEYWORDS = ["test", "examination", "scan", "x-ray", "mri", "ct", "ultrasound"]
+
+# Corrects typos and OCR errors in these terms (and lab analyte names) before classification
+term_normalizer = TermNormalizer(
+    CRITICAL_TERMS + RISK_TERMS + MEASUREMENT_PATTERNS + RECOMMENDATION_TERMS + NOTE_TERMS
+    + DIAGNOSIS_TERMS + DIAGNOSTIC_CONFIDENCE_TERMS + TEST_KEYWORDS + list(ANALYTE_ALIASES)
+)
 
 def structure_summary(text: str):
     """
@@ -195,84 +262,61 @@ def structure_summary(text: str):
         }
     }
 
-    # Medical terms and patterns to look for
-    critical_terms = [
-        "abnormal", "critical", "urgent", "immediate", "severe", "danger",
-        "warning", "alert", "high risk", "emergency", "concerning",
-        "irregular", "elevated", "below normal", "positive for"
-    ]
+    # Same lines, lower-cased with misspelt medical terms corrected; the classifiers match against these
+    normalized = term_normalizer.normalize(text)
+
+    # Non-empty lines with their (page, line) position, numbered the way extract_measurements numbers them
+    lines, normalized_lines, positions = [], [], []
+    for page_number, (page, normalized_page) in enumerate(zip(text.split("\f"), normalized.split("\f")), start=1):
+        for line_number, (line, l) in enumerate(zip(page.split("\n"), normalized_page.split("\n")), start=1):
+            if line.strip():
+                lines.append(line.strip())
+                normalized_lines.append(l.strip())
+                positions.append((page_number, line_number))
+
+    # Extract all measurements once and check them against reference ranges in one pass
+    measurements = evaluate_ranges(extract_measurements(normalized))
+    range_checks = {}  # (page, line) -> [(analyte, status), ...]
+    for analyte, status, page, line_number in zip(measurements["analyte"], measurements["status"],
+                                                  measurements["page"], measurements["line"]):
+        if status != STATUS_UNKNOWN:
+            range_checks.setdefault((int(page), int(line_number)), []).append((analyte, status))
     
-    risk_terms = [
-        "risk", "probability", "likelihood", "chance", "stratification",
-        "assessment", "score", "level", "grade", "stage", "classification"
-    ]
-    
-    measurement_patterns = [
-        "blood pressure", "heart rate", "temperature", "glucose",
-        "cholesterol", "bpm", "mmHg", "mg/dL", "white blood cell",
-        "red blood cell", "platelet", "hemoglobin", "creatinine"
-    ]
-
-    normal_ranges = {
-        "blood pressure": (90, 120),  # Systolic
-        "heart rate": (60, 100),
-        "temperature": (36.5, 37.5),  # Celsius
-        "glucose": (70, 140),  # mg/dL
-        "cholesterol": (0, 200)  # mg/dL
-    }
-
-    lines = [line.strip() for line in text.split("\n") if line.strip()]
-    
-    for line in lines:
-        l = line.lower()
-        
+    for line, l, position in zip(lines, normalized_lines, positions):
         # Check for critical findings and red flags
-        if any(term in l for term in critical_terms):
+        if any(term in l for term in CRITICAL_TERMS):
             sections["red_flags"].append(f"⚠️ {line}")
         
-        # Look for numeric measurements and compare with normal ranges
-        for measure in measurement_patterns:
-            if measure in l:
-                import re
-                numbers = re.findall(r'\d+\.?\d*', l)
-                if numbers:
-                    try:
-                        value = float(numbers[0])
-                        if measure in normal_ranges:
-                            low, high = normal_ranges[measure]
-                            if value < low or value > high:
-                                sections["red_flags"].append(f"⚠️ Abnormal {measure}: {line}")
-                            else:
-                                sections["key_findings"].append(f"✅ Normal {measure}: {line}")
-                    except ValueError:
-                        continue
+        # Numeric measurements compared with reference ranges
+        for measure, status in range_checks.get(position, ()):
+            if status != STATUS_NORMAL:
+                sections["red_flags"].append(f"⚠️ Abnormal {measure}: {line}")
+            else:
+                sections["key_findings"].append(f"✅ Normal {measure}: {line}")
 
         # Risk stratification analysis
-        if any(term in l for term in risk_terms):
+        if any(term in l for term in RISK_TERMS):
             sections["risk_stratification"].append(f"⚖️ {line}")
         
         # Look for recommendations and follow-up instructions
-        if any(term in l for term in ["recommend", "suggest", "advise", "follow up", "referral"]):
+        if any(term in l for term in RECOMMENDATION_TERMS):
             sections["recommendations"].append(f"💡 {line}")
         
         # Validation notes and additional findings
-        if any(term in l for term in ["note", "observation", "finding", "impression", "conclusion"]):
+        if any(term in l for term in NOTE_TERMS):
             sections["validation_notes"].append(f"📝 {line}")
 
     # Add diagnostic summaries if found
-    diagnosis_terms = ["diagnosis", "assessment", "impression"]
-    for line in lines:
-        l = line.lower()
-        if any(term in l for term in diagnosis_terms):
+    for line, l in zip(lines, normalized_lines):
+        if any(term in l for term in DIAGNOSIS_TERMS):
             sections["key_findings"].append(f"🔍 {line}")
 
     # Calculate confidence metrics
-    total_measurements = len([x for x in lines if any(pattern in x.lower() for pattern in measurement_patterns)])
+    total_measurements = len([x for x in normalized_lines if any(pattern in x for pattern in MEASUREMENT_PATTERNS)])
     total_findings = len(sections["key_findings"])
     
     # Diagnostic confidence based on presence of key medical terms and measurements
-    diagnostic_terms = sum(1 for line in lines if any(term in line.lower() for term in 
-        ["diagnosis", "confirmed", "observed", "examination", "assessment"]))
+    diagnostic_terms = sum(1 for l in normalized_lines if any(term in l for term in DIAGNOSTIC_CONFIDENCE_TERMS))
     sections["confidence_metrics"]["diagnostic_confidence"] = min(100, (diagnostic_terms / max(1, len(lines))) * 100)
     
     # Risk level distribution
@@ -282,9 +326,9 @@ def structure_summary(text: str):
         "low": sum(1 for x in sections["red_flags"] if any(term in x.lower() for term in ["mild", "minor", "low"]))
     }
     sections["confidence_metrics"]["risk_levels"] = [
-        {"level": "High Risk", "count": risk_levels["high"], "color": "rgba(255, 99, 132, 0.8)"},
-        {"level": "Medium Risk", "count": risk_levels["medium"], "color": "rgba(255, 206, 86, 0.8)"},
-        {"level": "Low Risk", "count": risk_levels["low"], "color": "rgba(75, 192, 192, 0.8)"}
+        RiskLevel("High Risk", risk_levels["high"], RED),
+        RiskLevel("Medium Risk", risk_levels["medium"], YELLOW),
+        RiskLevel("Low Risk", risk_levels["low"], GREEN)
     ]
 
     # Abnormal indicators tracking
@@ -294,38 +338,32 @@ def structure_summary(text: str):
         "normal": sum(1 for x in sections["key_findings"] if "normal" in x.lower())
     }
     sections["confidence_metrics"]["abnormal_indicators"] = [
-        {"label": "Critical", "value": abnormal_counts["critical"], "color": "rgba(255, 99, 132, 0.8)"},
-        {"label": "Abnormal", "value": abnormal_counts["abnormal"], "color": "rgba(255, 206, 86, 0.8)"},
-        {"label": "Normal", "value": abnormal_counts["normal"], "color": "rgba(75, 192, 192, 0.8)"}
+        Indicator("Critical", abnormal_counts["critical"], RED),
+        Indicator("Abnormal", abnormal_counts["abnormal"], YELLOW),
+        Indicator("Normal", abnormal_counts["normal"], GREEN)
     ]
 
     # Measurement accuracy (based on presence of specific values)
-    for measure in measurement_patterns:
+    for measure in MEASUREMENT_PATTERNS:
         found = False
-        for line in lines:
-            if measure in line.lower() and any(char.isdigit() for char in line):
-                sections["confidence_metrics"]["measurement_accuracy"].append({
-                    "parameter": measure,
-                    "confidence": 100 if any(unit in line.lower() for unit in ["mg/dl", "mmhg", "bpm"]) else 70
-                })
+        for l in normalized_lines:
+            if measure in l and any(char.isdigit() for char in l):
+                sections["confidence_metrics"]["measurement_accuracy"].append(MeasurementAccuracy(
+                    measure,
+                    100 if any(unit in l for unit in ["mg/dl", "mmhg", "bpm"]) else 70
+                ))
                 found = True
                 break
-        if not found and any(measure in line.lower() for line in lines):
-            sections["confidence_metrics"]["measurement_accuracy"].append({
-                "parameter": measure,
-                "confidence": 30
-            })
+        if not found and any(measure in l for l in normalized_lines):
+            sections["confidence_metrics"]["measurement_accuracy"].append(MeasurementAccuracy(measure, 30))
 
     # Test results confidence
-    test_keywords = ["test", "examination", "scan", "x-ray", "mri", "ct", "ultrasound"]
-    for keyword in test_keywords:
-        count = sum(1 for line in lines if keyword in line.lower())
+    for keyword in TEST_KEYWORDS:
+        count = sum(1 for l in normalized_lines if keyword in l)
         if count > 0:
-            sections["confidence_metrics"]["test_results"].append({
-                "test_type": keyword.upper(),
-                "count": count,
-                "confidence": min(100, count * 20)
-            })
+            sections["confidence_metrics"]["test_results"].append(
+                TestResult(keyword.upper(), count, min(100, count * 20))
+            )
 
     # If no entries found in any section, add default messages
     if not any(sections.values()):
@@ -338,12 +376,16 @@ def structure_summary(text: str):
             if not sections[key]:
                 sections[key] = [f"No {key.replace('_', ' ')} found in the report."]
 
-    return sections
+    return Summary(
+        confidence_metrics=ConfidenceMetrics(**sections.pop("confidence_metrics")),
+        measurements=measurements_to_json(measurements),
+        **sections
+    )
 
 
 @app.post("/upload")
 async def upload_file(request: Request, file: UploadFile, user_location: str = Form(None)):
-    global uploaded_text, uploaded_summary, chat_history
+    global uploaded_text, uploaded_summary, chat_history, summary_version
     
     # Save the uploaded file
     file_path = f"uploads/{file.filename}"
@@ -353,24 +395,29 @@ async def upload_file(request: Request, file: UploadFile, user_location: str = F
     # Always process new file uploads
     if file:
         chat_history.clear()
+        chat_history = ChatHistory(new_report_id())
         uploaded_text = extract_text(file_path)
         uploaded_summary = structure_summary(uploaded_text)
+        summary_version += 1
     
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "summary": uploaded_summary,
-        "chat": chat_history,
-        "user_location": user_location
-    })
+    return render_index(request, user_location)
 
 @app.post("/chat")
 async def chat(request: Request, user_input: str = Form(...)):
     global chat_history
     ai_reply = answer_query(uploaded_text, uploaded_summary, user_input)
-    chat_history.append({"role": "user", "content": user_input})
-    chat_history.append({"role": "ai", "content": ai_reply})
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "summary": uploaded_summary,
-        "chat": chat_history
-    })
+    chat_history.append("user", user_input)
+    chat_history.append("ai", ai_reply)
+    return render_index(request)
+
+@app.post("/chat/fragment", response_class=HTMLResponse)
+async def chat_fragment(user_input: str = Form(...)):
+    """Answer a chat message and render only the new messages"""
+    ai_reply = answer_query(uploaded_text, uploaded_summary, user_input)
+    messages = [chat_history.append("user", user_input), chat_history.append("ai", ai_reply)]
+    return templates.get_template("_chat_messages.html").render(messages=messages)
+
+@app.get("/summary/fragment", response_class=HTMLResponse)
+async def summary_fragment(user_location: str = None):
+    """Render only the summary panel for the current report"""
+    return render_summary_panel(user_location) if uploaded_summary else ""
@@ -0,0 +1,140 @@
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, List, Optional
+
+# Chart colours shared by every summary producer
+GREEN = "rgba(75, 192, 192, 0.8)"
+YELLOW = "rgba(255, 206, 86, 0.8)"
+RED = "rgba(255, 99, 132, 0.8)"
+
+
+@dataclass(slots=True)
+class RiskLevel:
+    level: str
+    count: int
+    color: str
+
+
+@dataclass(slots=True)
+class Indicator:
+    label: str
+    value: float
+    color: str
+
+
+@dataclass(slots=True)
+class MeasurementAccuracy:
+    parameter: str
+    confidence: float
+
+
+@dataclass(slots=True)
+class TestResult:
+    test_type: str
+    count: int
+    confidence: float
+
+
+@dataclass(slots=True)
+class ConfidenceMetrics:
+    diagnostic_confidence: float = 0
+    risk_levels: List[RiskLevel] = field(default_factory=list)
+    abnormal_indicators: List[Indicator] = field(default_factory=list)
+    measurement_accuracy: List[MeasurementAccuracy] = field(default_factory=list)
+    test_results: List[TestResult] = field(default_factory=list)
+
+    @classmethod
+    def placeholder(cls) -> "ConfidenceMetrics":
+        """Fixed chart values shown before a real analysis is available"""
+        return cls(
+            diagnostic_confidence=85,
+            risk_levels=[RiskLevel("Low", 2, GREEN), RiskLevel("Medium", 1, YELLOW), RiskLevel("High", 0, RED)],
+            abnormal_indicators=[Indicator("Normal", 75, GREEN), Indicator("Abnormal", 25, RED)],
+            measurement_accuracy=[
+                MeasurementAccuracy("Blood Tests", 90),
+                MeasurementAccuracy("Vital Signs", 95),
+                MeasurementAccuracy("Imaging", 85),
+                MeasurementAccuracy("Clinical Notes", 80),
+                MeasurementAccuracy("Patient History", 75)
+            ]
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ConfidenceMetrics":
+        return cls(
+            diagnostic_confidence=data.get("diagnostic_confidence", 0),
+            risk_levels=[RiskLevel(**r) for r in data.get("risk_levels", [])],
+            abnormal_indicators=[Indicator(**i) for i in data.get("abnormal_indicators", [])],
+            measurement_accuracy=[MeasurementAccuracy(**m) for m in data.get("measurement_accuracy", [])],
+            test_results=[TestResult(**t) for t in data.get("test_results", [])]
+        )
+
+
+@dataclass(slots=True)
+class Summary:
+    """
+    Structured analysis of a medical report, produced by structure_summary
+    (rule-based) and analyze_medical_report (LLM). `measurements` holds the
+    columnar lab values from lab_values.measurements_to_json; `failure` is
+    set only on summaries made by Summary.error.
+    """
+    red_flags: List[str] = field(default_factory=list)
+    risk_stratification: List[str] = field(default_factory=list)
+    validation_notes: List[str] = field(default_factory=list)
+    key_findings: List[str] = field(default_factory=list)
+    recommendations: List[str] = field(default_factory=list)
+    confidence_metrics: ConfidenceMetrics = field(default_factory=ConfidenceMetrics)
+    measurements: Optional[Dict[str, List[Any]]] = None
+    failure: Optional[str] = None
+
+    @classmethod
+    def placeholder(cls) -> "Summary":
+        """Empty summary with placeholder charts, shown before any upload"""
+        return cls(confidence_metrics=ConfidenceMetrics.placeholder())
+
+    @classmethod
+    def error(cls, red_flag: str, note: str) -> "Summary":
+        """Summary returned when analysis fails"""
+        return cls(red_flags=[red_flag], validation_notes=[note], failure=note)
+
+    @property
+    def failed(self) -> bool:
+        return self.failure is not None
+
+    @classmethod
+    def merge(cls, rule_based: "Summary", llm: "Summary") -> "Summary":
+        """
+        Combine the two analyses: LLM sections wherever it found anything,
+        rule-based sections otherwise. Charts and measurements come from the
+        rule-based pass, which computes them from the report itself.
+        """
+        return cls(
+            red_flags=llm.red_flags or rule_based.red_flags,
+            risk_stratification=llm.risk_stratification or rule_based.risk_stratification,
+            validation_notes=llm.validation_notes or rule_based.validation_notes,
+            key_findings=llm.key_findings or rule_based.key_findings,
+            recommendations=llm.recommendations or rule_based.recommendations,
+            confidence_metrics=rule_based.confidence_metrics,
+            measurements=rule_based.measurements
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Summary":
+        return cls(
+            red_flags=list(data.get("red_flags", [])),
+            risk_stratification=list(data.get("risk_stratification", [])),
+            validation_notes=list(data.get("validation_notes", [])),
+            key_findings=list(data.get("key_findings", [])),
+            recommendations=list(data.get("recommendations", [])),
+            confidence_metrics=ConfidenceMetrics.from_dict(data.get("confidence_metrics", {})),
+            measurements=data.get("measurements"),
+            failure=data.get("failure")
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_prompt_dict(self) -> Dict[str, Any]:
+        """to_dict() without the measurement columns, which would only pad LLM prompts"""
+        data = self.to_dict()
+        data.pop("measurements")
+        return data
@@ -0,0 +1,182 @@
+import os
+import re
+import zlib
+import hashlib
+import threading
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+import orjson
+from .config import MINHASH_DIR, NEAR_DUPLICATE_THRESHOLD
+
+NUM_PERM = 128
+BANDS, ROWS = 16, 8  # BANDS * ROWS == NUM_PERM; candidates start to appear around 0.7 similarity
+SHINGLE_SIZE = 3  # words per shingle
+INITIAL_CAPACITY = 1024  # signature rows allocated up front; doubled whenever full
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+# Fixed seed so signatures stay comparable across restarts
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """CRC32 of every run of SHINGLE_SIZE normalized words in the text"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        words = words + [""] * (SHINGLE_SIZE - len(words))
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of the text's shingles, NUM_PERM uint32 values"""
+    hashes = shingle_hashes(text)
+    # (a * x + b) mod p for every permutation and shingle at once; a, x < 2^32 so nothing overflows
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def content_key(patient_id: Optional[str], measurements: Dict[str, np.ndarray]) -> str:
+    """
+    Digest of the patient and the (analyte, value, unit) rows extracted from a
+    report. Reports that differ in a single lab value are still near
+    duplicates by MinHash, so a stored analysis is only reused when this
+    key matches as well.
+    """
+    rows = sorted(zip(
+        measurements["analyte"].tolist(), measurements["value"].tolist(), measurements["unit"].tolist()
+    ))
+    return hashlib.blake2b(orjson.dumps([patient_id or "", rows]), digest_size=16).hexdigest()
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of analysed reports. Only signatures, content keys and
+    band buckets are held in memory (about 0.5KB per report); summaries stay
+    on disk and are read back when a near duplicate is found. A candidate
+    only matches when its content key (see content_key) is equal too.
+
+    The index is append-only in MINHASH_DIR: each insert adds one raw row to
+    signatures.u32 and one {"id", "key"} line to index.jsonl, and both are
+    reloaded on startup. The in-memory signature matrix grows by doubling.
+    """
+
+    def __init__(self, directory: str = MINHASH_DIR, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.directory = directory
+        self.threshold = threshold
+        self.ids_path = os.path.join(directory, "index.jsonl")
+        self.signatures_path = os.path.join(directory, "signatures.u32")
+        self.summary_dir = os.path.join(directory, "summaries")
+        self._ids = []
+        self._keys = []
+        self._signatures = np.zeros((INITIAL_CAPACITY, NUM_PERM), dtype=np.uint32)  # first len(self) rows used
+        self._buckets: Dict[Tuple[int, bytes], list] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _band_keys(signature: np.ndarray):
+        for band in range(BANDS):
+            yield band, signature[band * ROWS:(band + 1) * ROWS].tobytes()
+
+    def _bucket(self, position: int) -> None:
+        for key in self._band_keys(self._signatures[position]):
+            self._buckets.setdefault(key, []).append(position)
+
+    def _load(self) -> None:
+        if not (os.path.exists(self.ids_path) and os.path.exists(self.signatures_path)):
+            return
+        entries = []
+        with open(self.ids_path, "rb") as f:
+            for line in f:
+                try:
+                    entries.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    break  # A partially written last line from an interrupted insert
+        signatures = np.fromfile(self.signatures_path, dtype=np.uint32)
+        count = min(len(entries), len(signatures) // NUM_PERM)
+        if count != len(entries) or count * NUM_PERM != len(signatures):
+            # Drop the half of an interrupted insert so later appends stay aligned
+            os.truncate(self.signatures_path, count * NUM_PERM * signatures.itemsize)
+            with open(self.ids_path, "wb") as f:
+                f.writelines(orjson.dumps(entry) + b"\n" for entry in entries[:count])
+
+        self._ids = [entry["id"] for entry in entries[:count]]
+        self._keys = [entry["key"] for entry in entries[:count]]
+        self._signatures = np.zeros((max(INITIAL_CAPACITY, 2 * count), NUM_PERM), dtype=np.uint32)
+        self._signatures[:count] = signatures[:count * NUM_PERM].reshape(count, NUM_PERM)
+        for position in range(count):
+            self._bucket(position)
+
+    def _append(self, report_id: str, signature: np.ndarray, key: str) -> None:
+        position = len(self._ids)
+        if position == len(self._signatures):
+            grown = np.zeros((2 * position, NUM_PERM), dtype=np.uint32)
+            grown[:position] = self._signatures
+            self._signatures = grown
+        self._signatures[position] = signature
+        self._ids.append(report_id)
+        self._keys.append(key)
+        self._bucket(position)
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.signatures_path, "ab") as f:
+            f.write(signature.astype(np.uint32).tobytes())
+        with open(self.ids_path, "ab") as f:
+            f.write(orjson.dumps({"id": report_id, "key": key}) + b"\n")
+
+    def find(self, signature: np.ndarray, key: str) -> Optional[Tuple[str, float]]:
+        """
+        Best stored report with the same content key and an estimated Jaccard
+        similarity at or above the threshold
+        """
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(signature):
+                candidates.update(self._buckets.get(band_key, ()))
+            candidates = [position for position in candidates if self._keys[position] == key]
+            if not candidates:
+                return None
+            positions = np.fromiter(candidates, dtype=np.intp)
+            similarities = (self._signatures[positions] == signature).mean(axis=1)
+            best = int(similarities.argmax())
+            if similarities[best] < self.threshold:
+                return None
+            return self._ids[positions[best]], float(similarities[best])
+
+    def add(self, report_id: str, signature: np.ndarray, key: str, summary: Any) -> None:
+        """Store a report's signature, content key and summary (anything orjson can serialize) for later reuse"""
+        os.makedirs(self.summary_dir, exist_ok=True)
+        with open(os.path.join(self.summary_dir, f"{report_id}.json"), "wb") as f:
+            f.write(orjson.dumps(summary))
+        with self._lock:
+            self._append(report_id, signature, key)
+
+    def load_summary(self, report_id: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self.summary_dir, f"{report_id}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+
+    def lookup(self, text: str, key: str) -> Tuple[np.ndarray, Optional[Dict[str, Any]]]:
+        """
+        Signature for `text` plus the match details ({"report_id", "similarity",
+        "summary"}) of a stored near duplicate with the same content key, or
+        None when there is none
+        """
+        signature = minhash(text)
+        match = self.find(signature, key)
+        if match is None:
+            return signature, None
+        summary = self.load_summary(match[0])
+        if summary is None:
+            return signature, None
+        return signature, {"report_id": match[0], "similarity": match[1], "summary": summary}
@@ -1,8 +1,6 @@
 import fitz  # PyMuPDF
 
 def extract_text_from_pdf(file_path):
-    text = ""
+    # Pages are separated by form feeds so extracted values keep their page number
     doc = fitz.open(file_path)
-    for page in doc:
-        text += page.get_text()
-    return text
+    return "\n\f".join(page.get_text() for page in doc)
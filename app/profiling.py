@@ -0,0 +1,165 @@
+import sys
+import uuid
+import time
+import threading
+import itertools
+from collections import Counter, OrderedDict
+from typing import Dict, Any, Optional
+from urllib.parse import parse_qs
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+from .config import PROFILE_TOKEN, PROFILE_SAMPLE_EVERY, PROFILE_INTERVAL, PROFILE_KEEP
+
+# Leaf frames in these modules are threads waiting for work, not doing it
+_IDLE_MODULES = ("threading.py", "queue.py", "selectors.py")
+
+
+class StackSampler:
+    """
+    Samples the stacks of all other threads every `interval` seconds and
+    counts them in folded form ("thread;outer;...;inner"), the input format
+    of flamegraph.pl and speedscope. Threads sitting idle are skipped.
+    Because every thread is sampled, work done for other requests running at
+    the same time can show up in a profile.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or frame.f_code.co_filename.endswith(_IDLE_MODULES):
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[";".join(reversed(stack))] += 1
+
+
+# Finished profiles by request id, oldest evicted first
+_profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def _store(profile: Dict[str, Any]) -> None:
+    with _profiles_lock:
+        _profiles[profile["request_id"]] = profile
+        while len(_profiles) > PROFILE_KEEP:
+            _profiles.popitem(last=False)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a single request when it carries `X-Profile: <PROFILE_TOKEN>` or
+    `?profile=<PROFILE_TOKEN>`, and every PROFILE_SAMPLE_EVERY-th request when
+    that is set. Profiled responses get an X-Profile-Id header; the profile is
+    then available from /api/v1/profiles/{id}. Requests that are not profiled
+    go straight through.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._counter = itertools.count(1)
+
+    def _should_profile(self, scope: Scope) -> bool:
+        if scope["path"].startswith(router.prefix):
+            return False
+        if PROFILE_TOKEN:
+            for name, value in scope["headers"]:
+                if name == b"x-profile" and value.decode("latin-1") == PROFILE_TOKEN:
+                    return True
+            query = scope.get("query_string", b"")
+            if b"profile=" in query and parse_qs(query.decode("latin-1")).get("profile") == [PROFILE_TOKEN]:
+                return True
+        return PROFILE_SAMPLE_EVERY > 0 and next(self._counter) % PROFILE_SAMPLE_EVERY == 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex
+        status = {"code": None}
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        sampler = StackSampler().start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            counts = sampler.stop()
+            _store({
+                "request_id": request_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status["code"],
+                "seconds": round(time.perf_counter() - started, 4),
+                "samples": sampler.samples,
+                "folded": "\n".join(f"{stack} {count}" for stack, count in counts.most_common())
+            })
+
+
+router = APIRouter(prefix="/api/v1/profiles", tags=["Profiling"])
+
+
+def _require_admin(token: Optional[str]) -> None:
+    if not PROFILE_TOKEN or token != PROFILE_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling is not enabled for this caller")
+
+
+@router.get("")
+async def list_profiles(x_profile: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """
+    List the stored request profiles, newest first
+    """
+    _require_admin(x_profile)
+    with _profiles_lock:
+        profiles = [
+            {k: v for k, v in profile.items() if k != "folded"}
+            for profile in reversed(_profiles.values())
+        ]
+    return {
+        "success": True,
+        "profiles": profiles
+    }
+
+
+@router.get("/{request_id}", response_class=PlainTextResponse)
+async def get_profile(request_id: str, x_profile: Optional[str] = Header(None)) -> str:
+    """
+    Get one request's profile as folded stacks (flamegraph.pl / speedscope input)
+    """
+    _require_admin(x_profile)
+    with _profiles_lock:
+        profile = _profiles.get(request_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No profile for this request id")
+    return profile["folded"]
@@ -0,0 +1,88 @@
+import re
+import threading
+from typing import Dict, Iterable
+import numpy as np
+from rapidfuzz import process, fuzz
+from rapidfuzz.distance import OSA
+
+_TOKEN_RE = re.compile(r"[a-z]+")
+
+MIN_TOKEN_LENGTH = 5  # Shorter tokens are too close to too many terms to correct safely
+SCORE_CUTOFF = 88  # fuzz.ratio; keeps "hemoglobln" -> "hemoglobin" but not "normal" -> "abnormal"
+MAX_EDITS = 1  # A typo is one insertion, deletion, substitution or swap of adjacent letters
+INFLECTION_SUFFIXES = ("s", "es", "d", "ed", "ing", "ly")
+MEMO_LIMIT = 100_000
+
+# Real words one edit away from a vocabulary term with a different meaning
+# ("emergence" delirium is not an emergency); never corrected
+KNOWN_WORDS = frozenset({"emergence", "diagnoses", "conformed", "confirmer"})
+
+
+class TermNormalizer:
+    """
+    Maps misspelt or OCR-mangled tokens to a clinical vocabulary.
+
+    A document is tokenized once; every distinct token that is neither in the
+    vocabulary nor already resolved is scored against the whole vocabulary in
+    a single multithreaded rapidfuzz cdist call. Results, including "no
+    match", are memoized, so repeat tokens across documents cost a dict lookup.
+
+    A correction must be a plausible typo: at most MAX_EDITS edits away, and
+    neither the term plus extra letters ("scant", "tests") nor the term minus
+    an inflection ("elevate" for "elevated"). Tokens in `known_words` are
+    real words and are left as they are.
+    """
+
+    def __init__(self, vocabulary: Iterable[str], score_cutoff: float = SCORE_CUTOFF,
+                 min_length: int = MIN_TOKEN_LENGTH, workers: int = -1,
+                 known_words: Iterable[str] = KNOWN_WORDS):
+        self.vocabulary = sorted({word for term in vocabulary for word in _TOKEN_RE.findall(term.lower())})
+        self.score_cutoff = score_cutoff
+        self.min_length = min_length
+        self.workers = workers
+        self._known = set(self.vocabulary) | set(known_words)
+        self._memo: Dict[str, str] = {}  # token -> canonical term, "" when nothing is close enough
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_typo_of(token: str, term: str) -> bool:
+        # "scant" is not a misspelt "scan", nor "elevate" a misspelt "elevated"
+        if token.startswith(term) or (term.startswith(token) and term[len(token):] in INFLECTION_SUFFIXES):
+            return False
+        return OSA.distance(token, term, score_cutoff=MAX_EDITS) <= MAX_EDITS
+
+    def resolve(self, tokens: Iterable[str]) -> Dict[str, str]:
+        """Canonical term for every token that has one (vocabulary and known words are left out)"""
+        tokens = set(tokens)
+        with self._lock:
+            unknown = [
+                t for t in tokens
+                if len(t) >= self.min_length and t not in self._known and t not in self._memo
+            ]
+        if unknown:
+            scores = process.cdist(
+                unknown, self.vocabulary, scorer=fuzz.ratio,
+                score_cutoff=self.score_cutoff, dtype=np.uint8, workers=self.workers
+            )
+            best = scores.argmax(axis=1)
+            best_scores = scores[np.arange(len(unknown)), best]
+            with self._lock:
+                if len(self._memo) + len(unknown) > MEMO_LIMIT:
+                    self._memo.clear()
+                for token, index, score in zip(unknown, best, best_scores):
+                    term = self.vocabulary[index] if score else ""
+                    self._memo[token] = term if term and self._is_typo_of(token, term) else ""
+        with self._lock:
+            return {t: self._memo[t] for t in tokens if self._memo.get(t)}
+
+    def normalize(self, text: str) -> str:
+        """
+        Lower-cased text with near-miss tokens replaced by their canonical
+        terms. Line and page breaks are preserved, so line N of the result is
+        line N of the input.
+        """
+        lowered = text.lower()
+        mapping = self.resolve(_TOKEN_RE.findall(lowered))
+        if not mapping:
+            return lowered
+        return _TOKEN_RE.sub(lambda m: mapping.get(m.group(0), m.group(0)), lowered)
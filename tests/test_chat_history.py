@@ -0,0 +1,33 @@
+from app.chat_history import ChatHistory
+
+
+def _page_all(history, page_size):
+    ids, cursor = [], 0
+    while True:
+        page = history.after(cursor, page_size)
+        ids.extend(message["id"] for message in page["messages"])
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            return ids
+
+
+def test_paging_across_spill_and_buffer_returns_every_id_once(tmp_path):
+    history = ChatHistory("report", limit=3, spill_dir=str(tmp_path))
+    for i in range(10):
+        history.append("user", f"message {i}")
+
+    # Ids 1-7 are spilled to disk, 8-10 are buffered; page sizes that do and don't align with the boundary
+    for page_size in (1, 2, 3, 4, 7, 50):
+        assert _page_all(history, page_size) == list(range(1, 11))
+
+
+def test_after_cursor_inside_buffer(tmp_path):
+    history = ChatHistory("report", limit=3, spill_dir=str(tmp_path))
+    for i in range(5):
+        history.append("user", f"message {i}")
+
+    page = history.after(3, 50)
+    assert [message["id"] for message in page["messages"]] == [4, 5]
+    assert page["next_cursor"] == 5
+    assert not page["has_more"]
+    assert history.after(5, 50)["messages"] == []
@@ -0,0 +1,58 @@
+import pytest
+from app import lab_store
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(lab_store, "LAB_STORE_PATH", str(tmp_path / "lab_results.sqlite3"))
+    monkeypatch.setattr(lab_store, "_connection", None)
+    yield
+    if lab_store._connection is not None:
+        lab_store._connection.close()
+
+
+def _measurements(*rows):
+    return {
+        "analyte": [r[0] for r in rows],
+        "value": [r[1] for r in rows],
+        "unit": [r[2] for r in rows],
+        "status": ["normal"] * len(rows)
+    }
+
+
+def test_trend_has_one_point_per_report_with_deltas():
+    lab_store.ingest_reports([
+        # A summary table plus a detail section: only the first value counts
+        {"report_id": "r1", "patient_id": "p1", "observed_at": "2024-01-01",
+         "measurements": _measurements(("hemoglobin", 12.0, "g/dL"), ("hemoglobin", 12.0, "g/dL"))},
+        {"report_id": "r3", "patient_id": "p1", "observed_at": "2024-03-01",
+         "measurements": _measurements(("hemoglobin", 10.6, "g/dL"), ("hemoglobin", 99.0, "g/dL"))},
+        {"report_id": "r2", "patient_id": "p1", "observed_at": "2024-02-01",
+         "measurements": _measurements(("hemoglobin", 11.0, "g/dL"), ("glucose", 90.0, "mg/dL"))},
+        {"report_id": "other", "patient_id": "p2", "observed_at": "2024-02-15",
+         "measurements": _measurements(("hemoglobin", 15.0, "g/dL"))},
+    ])
+
+    trends = lab_store.get_trends("p1")
+    hemoglobin = trends["hemoglobin"]
+    assert [p["report_id"] for p in hemoglobin["points"]] == ["r1", "r2", "r3"]
+    assert [p["value"] for p in hemoglobin["points"]] == [12.0, 11.0, 10.6]
+    assert hemoglobin["deltas"] == [-1.0, -0.4]
+    assert hemoglobin["change"] == -1.4
+    assert [p["value"] for p in trends["glucose"]["points"]] == [90.0]
+
+
+def test_limit_counts_reports_not_rows():
+    lab_store.ingest_reports([
+        {"report_id": f"r{i}", "patient_id": "p1", "observed_at": f"2024-0{i}-01",
+         "measurements": _measurements(("potassium", 4.0 + i, "mmol/L"), ("potassium", 0.0, "mmol/L"))}
+        for i in range(1, 5)
+    ])
+
+    points = lab_store.get_trends("p1", "potassium", limit=2)["potassium"]["points"]
+    assert [(p["report_id"], p["value"]) for p in points] == [("r3", 7.0), ("r4", 8.0)]
+
+
+def test_reports_without_patient_are_not_stored():
+    assert lab_store.store_measurements("r1", _measurements(("sodium", 140.0, "mmol/L"))) == 0
+    assert lab_store.get_trends("") == {}
@@ -0,0 +1,42 @@
+from app.lab_values import extract_measurements, evaluate_ranges, measurements_to_json
+from app.main import structure_summary
+
+
+def _rows(text):
+    table = measurements_to_json(evaluate_ranges(extract_measurements(text)))
+    return list(zip(table["analyte"], table["value"], table["unit"], table["status"]))
+
+
+def test_cumm_and_lakh_counts_have_their_own_ranges():
+    assert _rows("Total WBC count 7500 /cumm\nPlatelet count 2.5 lakhs/cumm\nPlatelets 250000 cells/cumm") == [
+        ("white blood cell", 7500.0, "/µL", "normal"),
+        ("platelet", 2.5, "lakh/µL", "normal"),
+        ("platelet", 250000.0, "/µL", "normal"),
+    ]
+
+
+def test_bare_temperature_units():
+    assert _rows("Temperature 98.6 F\nTemp 37 C\nTemperature 39.2 C") == [
+        ("temperature", 98.6, "°F", "normal"),
+        ("temperature", 37.0, "°C", "normal"),
+        ("temperature", 39.2, "°C", "high"),
+    ]
+
+
+def test_unlisted_unit_is_not_range_checked():
+    assert _rows("Potassium 4 mEq\nGlucose 100 /hpf") == [
+        ("potassium", 4.0, "mEq", "unknown"),
+        ("glucose", 100.0, "/hpf", "unknown"),
+    ]
+
+
+def test_bare_value_uses_default_unit():
+    assert _rows("Glucose 90\nHemoglobin 9.0 L") == [
+        ("glucose", 90.0, "mg/dL", "normal"),
+        ("hemoglobin", 9.0, "g/dL", "low"),
+    ]
+
+
+def test_normal_counts_in_local_units_are_not_red_flags():
+    summary = structure_summary("Total WBC count 7500 /cumm\nPlatelet count 2.5 lakhs/cumm\nTemperature 98.6 F")
+    assert summary.red_flags == ["No red flags found in the report."]
@@ -0,0 +1,63 @@
+import time
+import threading
+import pytest
+from app.llm_scheduler import LLMScheduler, LLMOverloaded, INTERACTIVE, BULK
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_interactive_call_is_served_before_queued_bulk_call():
+    scheduler = LLMScheduler(max_concurrency=1, rate_per_minute=6000, burst=10)
+    release = threading.Event()
+    order = []
+
+    def hold():
+        with scheduler.slot(BULK, deadline=30):
+            release.wait(5)
+
+    def call(name, priority):
+        with scheduler.slot(priority, deadline=30):
+            order.append(name)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    _wait_until(lambda: scheduler.stats()["running"] == 1)
+    bulk = threading.Thread(target=call, args=("bulk", BULK))
+    bulk.start()
+    _wait_until(lambda: scheduler.stats()["queued"] == 1)
+    interactive = threading.Thread(target=call, args=("interactive", INTERACTIVE))
+    interactive.start()
+    _wait_until(lambda: scheduler.stats()["queued"] == 2)
+
+    release.set()
+    for thread in (holder, bulk, interactive):
+        thread.join(5)
+    assert order == ["interactive", "bulk"]
+
+
+def test_call_is_shed_when_busy_slots_exceed_its_deadline():
+    scheduler = LLMScheduler(max_concurrency=1, rate_per_minute=6000, burst=10)
+    with scheduler.slot(BULK, deadline=30):
+        # One call running, no history yet: the estimate is one average call duration (5s)
+        with pytest.raises(LLMOverloaded) as shed:
+            with scheduler.slot(INTERACTIVE, deadline=1):
+                pass
+    assert shed.value.retry_after == 5
+    assert scheduler.stats()["rejected"] == 1
+    assert scheduler.stats()["queued"] == 0
+
+
+def test_call_is_shed_when_token_bucket_is_empty():
+    scheduler = LLMScheduler(max_concurrency=4, rate_per_minute=60, burst=1)
+    with scheduler.slot(BULK, deadline=30):
+        pass
+    # The only token is spent and refills at one per second
+    with pytest.raises(LLMOverloaded) as shed:
+        with scheduler.slot(INTERACTIVE, deadline=0.5):
+            pass
+    assert shed.value.retry_after == 1
@@ -0,0 +1,14 @@
+from app.models import Summary
+
+
+def test_red_flag_starting_with_error_is_not_a_failure():
+    summary = Summary(red_flags=["Errors in medication dosing"])
+    assert not summary.failed
+    assert not Summary.merge(Summary(), summary).failed
+
+
+def test_error_summary_is_a_failure_and_survives_round_trip():
+    summary = Summary.error("Error: Unable to analyze report", "Error during analysis: timeout")
+    assert summary.failed
+    assert summary.failure == "Error during analysis: timeout"
+    assert Summary.from_dict(summary.to_dict()).failed
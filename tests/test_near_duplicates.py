@@ -0,0 +1,54 @@
+import os
+import numpy as np
+from app import near_duplicates
+from app.near_duplicates import NearDuplicateIndex, NUM_PERM, content_key, minhash
+from app.lab_values import extract_measurements
+
+REPORT = (
+    "Patient laboratory report. Chemistry panel results follow. Sodium 140 mmol/L. "
+    "Chloride 100 mmol/L. Glucose 90 mg/dL. Reviewed by the attending physician.\n"
+)
+
+
+def _key(patient_id, text):
+    return content_key(patient_id, extract_measurements(text))
+
+
+def test_reuse_requires_same_patient_and_values(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path), threshold=0.9)
+    text = REPORT + "Potassium 6.8 mmol/L"
+    signature, match = index.lookup(text, _key("p1", text))
+    assert match is None
+    index.add("r1", signature, _key("p1", text), {"red_flags": ["high potassium"]})
+
+    assert index.lookup(text, _key("p1", text))[1]["report_id"] == "r1"
+    assert index.lookup(text, _key("p2", text))[1] is None
+    changed = REPORT + "Potassium 4.0 mmol/L"
+    assert index.lookup(changed, _key("p1", changed))[1] is None
+
+
+def test_index_grows_and_reloads(tmp_path, monkeypatch):
+    monkeypatch.setattr(near_duplicates, "INITIAL_CAPACITY", 2)
+    index = NearDuplicateIndex(str(tmp_path))
+    texts = [f"{REPORT} report number {i} " * 3 for i in range(5)]
+    for i, text in enumerate(texts):
+        index.add(f"r{i}", minhash(text), f"k{i}", {})
+
+    reloaded = NearDuplicateIndex(str(tmp_path))
+    assert len(reloaded) == 5
+    for i, text in enumerate(texts):
+        assert reloaded.find(minhash(text), f"k{i}") == (f"r{i}", 1.0)
+
+
+def test_interrupted_insert_is_dropped_on_load(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path))
+    index.add("r1", minhash(REPORT), "k1", {})
+    # Signature written, id line never made it
+    with open(index.signatures_path, "ab") as f:
+        f.write(np.zeros(NUM_PERM, dtype=np.uint32).tobytes())
+
+    reloaded = NearDuplicateIndex(str(tmp_path))
+    assert len(reloaded) == 1
+    assert os.path.getsize(index.signatures_path) == NUM_PERM * 4
+    reloaded.add("r2", minhash(REPORT + " again"), "k2", {})
+    assert len(NearDuplicateIndex(str(tmp_path))) == 2
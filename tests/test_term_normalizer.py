@@ -0,0 +1,40 @@
+from app.main import structure_summary, term_normalizer
+
+
+def test_misspellings_are_corrected():
+    text = "Hemoglobln 10 g/dL\ncholestrol 250\ncreatinin 2.0\nDiagnosys: anemia"
+    assert term_normalizer.normalize(text) == "hemoglobin 10 g/dl\ncholesterol 250\ncreatinine 2.0\ndiagnosis: anemia"
+
+
+def test_swapped_and_dropped_letters_are_corrected():
+    assert term_normalizer.normalize("hemoglboin temprature platelt") == "hemoglobin temperature platelet"
+
+
+def test_real_words_are_not_rewritten():
+    for word in ["creatine", "emergence", "diagnostics", "normal", "temperate", "saturating", "testosterone"]:
+        assert term_normalizer.normalize(word) == word
+
+
+def test_inflections_and_extensions_are_not_rewritten():
+    for word in ["scant", "elevate", "observe", "notes", "alerted"]:
+        assert term_normalizer.normalize(word) == word
+
+
+def test_scant_is_not_a_scan():
+    assert term_normalizer.normalize("Scant fluid in pelvis") == "scant fluid in pelvis"
+
+
+def test_emergence_delirium_is_not_a_red_flag():
+    summary = structure_summary("No emergence delirium noted")
+    assert summary.red_flags == ["No red flags found in the report."]
+
+
+def test_creatine_kinase_is_not_creatinine():
+    summary = structure_summary("Creatine kinase: 180")
+    assert not any("creatinine" in flag for flag in summary.red_flags)
+    assert "creatinine" not in summary.measurements["analyte"]
+
+
+def test_diagnostics_is_not_a_diagnosis():
+    summary = structure_summary("Diagnostics performed at the central laboratory")
+    assert not any(finding.startswith("🔍") for finding in summary.key_findings)